@@ -0,0 +1,332 @@
+import os
+import re
+import sys
+import uuid
+import time
+import queue
+import atexit
+import argparse
+import datetime
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# --- ALMACÉN ANALÍTICO COLUMNAR (PARQUET) ---
+#
+# Eventos de sesión, respuestas y turnos de chat se agregan a un dataset Parquet
+# local particionado por fecha y área (estilo Hive):
+#
+#   data/analytics/<tabla>/fecha=2025-01-31/area=Finanzas/part-<hora>-<id>.parquet
+#
+# La escritura la hace un hilo en segundo plano que agrupa eventos (un archivo por
+# partición y vaciado), así el rerun de Streamlit nunca espera al disco.
+# dashboard.py lee el dataset con filtros de partición y agrega con pyarrow.
+#
+# Cada vaciado deja archivos pequeños. El mismo hilo compacta cada
+# ANALYTICS_COMPACT_SECONDS las particiones cerradas (fechas anteriores a hoy):
+# une sus archivos en uno solo. Con ANALYTICS_COMPACT_SECONDS=0 no se compacta
+# en la app y se programa por cron, p. ej. cada noche:
+#
+#   15 0 * * *  cd /srv/tech_ideas && python analytics_store.py compact
+#
+# Un candado de archivo (.compact.lock) evita que dos procesos compacten a la vez.
+
+DEFAULT_ANALYTICS_DIR = "data/analytics"
+FLUSH_EVERY_EVENTS = 500
+FLUSH_EVERY_SECONDS = 10
+READ_RETRIES = 3
+COMPACT_EVERY_SECONDS = int(os.getenv("ANALYTICS_COMPACT_SECONDS", "3600"))
+
+PARTITIONING = ds.partitioning(pa.schema([("fecha", pa.string()), ("area", pa.string())]), flavor="hive")
+
+SCHEMAS = {
+    # Una fila por sesión finalizada (chat o entrevista)
+    "sessions": pa.schema([
+        ("session_id", pa.string()),
+        ("app", pa.string()),
+        ("nombre_id", pa.string()),
+        ("rol_jerarquico", pa.string()),
+        ("timestamp_inicio", pa.timestamp("us")),
+        ("timestamp_fin", pa.timestamp("us")),
+        ("duracion_seg", pa.float64()),
+        ("mensajes", pa.int32()),
+        ("chars_usuario", pa.int32()),
+        ("chars_asistente", pa.int32()),
+    ]),
+    # Una fila por respuesta de entrevista guardada
+    "answers": pa.schema([
+        ("session_id", pa.string()),
+        ("app", pa.string()),
+        ("nombre_id", pa.string()),
+        ("rol_jerarquico", pa.string()),
+        ("id_pregunta", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("chars_respuesta", pa.int32()),
+        ("palabras_respuesta", pa.int32()),
+    ]),
+    # Una fila por turno de chat con métricas del streaming
+    "turns": pa.schema([
+        ("session_id", pa.string()),
+        ("app", pa.string()),
+        ("rol_jerarquico", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("chars_prompt", pa.int32()),
+        ("chars_respuesta", pa.int32()),
+        ("ttft_ms", pa.float64()),
+        ("stream_ms", pa.float64()),
+        ("desde_cache", pa.bool_()),
+        ("prompt_tokens", pa.int32()),
+        ("completion_tokens", pa.int32()),
+    ]),
+}
+
+
+def _partition_value(value):
+    """Valor seguro para usar como nombre de carpeta de partición."""
+    return re.sub(r"[^\w-]", "_", str(value or "N_A"))
+
+
+class AnalyticsStore:
+    """Escritor en segundo plano y lector del dataset Parquet particionado."""
+
+    def __init__(self, root, compact_every=COMPACT_EVERY_SECONDS):
+        self.root = root
+        self.compact_every = compact_every
+        self._last_compact = 0.0
+        self._queue = queue.Queue()
+        self._flush_now = threading.Event()
+        self._thread = threading.Thread(target=self._writer_loop, name="analytics-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    # --- Escritura ---
+
+    def append(self, table, event):
+        """
+        Encola un evento. Debe traer 'area_proceso' y un datetime/ISO en
+        'timestamp' o 'timestamp_fin' para elegir la partición.
+        """
+        if table not in SCHEMAS:
+            raise KeyError(f"Tabla analítica desconocida: {table}")
+        self._queue.put((table, event))
+        if self._queue.qsize() >= FLUSH_EVERY_EVENTS:
+            self._flush_now.set()
+
+    def flush(self):
+        """Escribe todo lo encolado (bloqueante). Se llama también al salir del proceso."""
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if pending:
+            self._write(pending)
+
+    def _writer_loop(self):
+        while True:
+            self._flush_now.wait(FLUSH_EVERY_SECONDS)
+            self._flush_now.clear()
+            try:
+                self.flush()
+            except Exception as e:  # Un lote inválido no debe detener al escritor
+                print(f"⚠️ Error escribiendo eventos analíticos: {e}")
+
+            if self.compact_every and time.monotonic() - self._last_compact >= self.compact_every:
+                self._last_compact = time.monotonic()
+                try:
+                    self.compact_closed()
+                except Exception as e:
+                    print(f"⚠️ Error compactando el almacén analítico: {e}")
+
+    def _write(self, pending):
+        # Agrupar por (tabla, fecha, área): un archivo Parquet por partición y vaciado
+        groups = {}
+        for table, event in pending:
+            when = event.get("timestamp") or event.get("timestamp_fin")
+            if isinstance(when, str):
+                when = datetime.datetime.fromisoformat(when)
+            fecha = (when or datetime.datetime.now()).date().isoformat()
+            key = (table, fecha, _partition_value(event.get("area_proceso")))
+            groups.setdefault(key, []).append(event)
+
+        stamp = datetime.datetime.now().strftime("%H%M%S")
+        for (table, fecha, area), events in groups.items():
+            schema = SCHEMAS[table]
+            rows = [{name: _coerce(e.get(name), schema.field(name).type) for name in schema.names} for e in events]
+            directory = os.path.join(self.root, table, f"fecha={fecha}", f"area={area}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(pa.Table.from_pylist(rows, schema=schema), path)
+
+    def compact(self, table, before=None):
+        """
+        Une los archivos de cada partición en uno solo. Con `before` (fecha ISO)
+        solo toca las particiones de fechas anteriores. Retorna cuántas compactó.
+        """
+        base = os.path.join(self.root, table)
+        merged_count = 0
+        for dirpath, _, filenames in os.walk(base):
+            parts = sorted(f for f in filenames if f.endswith(".parquet"))
+            if len(parts) < 2:
+                continue
+            if before:
+                fecha = next((d.removeprefix("fecha=") for d in dirpath.split(os.sep) if d.startswith("fecha=")), None)
+                if fecha is None or fecha >= before:
+                    continue
+            paths = [os.path.join(dirpath, f) for f in parts]
+            # El dataset rellena con nulos las columnas que los archivos antiguos no tienen
+            merged = ds.dataset(paths, format="parquet", schema=SCHEMAS[table]).to_table()
+            # Con prefijo '.' el dataset ignora el archivo mientras se escribe
+            name = f"compact-{uuid.uuid4().hex[:8]}.parquet"
+            tmp_path = os.path.join(dirpath, f".{name}.tmp")
+            pq.write_table(merged, tmp_path)
+            os.replace(tmp_path, os.path.join(dirpath, name))
+            for p in paths:
+                os.remove(p)
+            merged_count += 1
+        return merged_count
+
+    def compact_closed(self):
+        """
+        Compacta las particiones cerradas (fecha anterior a hoy) de todas las tablas.
+        Si otro proceso ya está compactando, no hace nada y retorna 0.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".compact.lock"), "w") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return 0
+            today = datetime.date.today().isoformat()
+            return sum(self.compact(table, before=today) for table in SCHEMAS)
+
+    # --- Lectura ---
+
+    def dataset(self, table):
+        """Dataset Arrow de la tabla, o None si aún no hay datos."""
+        path = os.path.join(self.root, table)
+        if not os.path.isdir(path):
+            return None
+        return ds.dataset(path, format="parquet", partitioning=PARTITIONING, schema=SCHEMAS[table].append(
+            pa.field("fecha", pa.string())).append(pa.field("area", pa.string())))
+
+    def read(self, table, columns=None, fecha_desde=None, fecha_hasta=None, areas=None):
+        """Lee solo las particiones y columnas necesarias como pyarrow.Table."""
+        expr = None
+        conditions = []
+        if fecha_desde:
+            conditions.append(ds.field("fecha") >= str(fecha_desde))
+        if fecha_hasta:
+            conditions.append(ds.field("fecha") <= str(fecha_hasta))
+        if areas:
+            conditions.append(ds.field("area").isin([_partition_value(a) for a in areas]))
+        for condition in conditions:
+            expr = condition if expr is None else expr & condition
+
+        # La compactación borra archivos que una lectura en curso ya había listado:
+        # se vuelve a listar el dataset y se reintenta
+        for attempt in range(READ_RETRIES):
+            dataset = self.dataset(table)
+            if dataset is None:
+                return None
+            try:
+                return dataset.to_table(columns=columns, filter=expr)
+            except FileNotFoundError:
+                if attempt == READ_RETRIES - 1:
+                    raise
+
+
+# --- AGREGADOS PARA EL DASHBOARD ---
+#
+# Todo se calcula con group_by de Arrow (vectorizado y multihilo); a pandas solo
+# pasan los resultados agregados, que son pequeños.
+
+def summarize(store, fecha_desde=None, fecha_hasta=None, areas=None):
+    """Calcula los agregados del dashboard como dict de pyarrow.Table; las tablas sin datos no aparecen."""
+    filters = {"fecha_desde": fecha_desde, "fecha_hasta": fecha_hasta, "areas": areas}
+    result = {}
+
+    sessions = store.read("sessions", ["fecha", "area", "rol_jerarquico", "duracion_seg", "mensajes"], **filters)
+    if sessions is not None and sessions.num_rows:
+        result["sesiones_por_rol_area"] = sessions.group_by(["rol_jerarquico", "area"]).aggregate([
+            ("duracion_seg", "mean"),
+            ("duracion_seg", "count"),
+            ("mensajes", "mean"),
+        ])
+        result["sesiones_por_dia"] = sessions.group_by("fecha").aggregate([("duracion_seg", "count")]).sort_by("fecha")
+
+    answers = store.read("answers", ["area", "rol_jerarquico", "id_pregunta", "chars_respuesta", "palabras_respuesta"], **filters)
+    if answers is not None and answers.num_rows:
+        result["respuestas_por_rol_area"] = answers.group_by(["rol_jerarquico", "area"]).aggregate([
+            ("chars_respuesta", "mean"),
+            ("palabras_respuesta", "mean"),
+            ("id_pregunta", "count"),
+        ])
+        result["respuestas_por_pregunta"] = answers.group_by("id_pregunta").aggregate([
+            ("chars_respuesta", "mean"),
+            ("id_pregunta", "count"),
+        ]).sort_by("id_pregunta")
+
+    turns = store.read("turns", ["area", "ttft_ms", "stream_ms", "chars_respuesta", "desde_cache", "prompt_tokens", "completion_tokens"], **filters)
+    if turns is not None and turns.num_rows:
+        turns = turns.append_column("desde_cache_num", turns["desde_cache"].cast(pa.int8()))
+        result["streaming_por_area"] = turns.group_by("area").aggregate([
+            ("ttft_ms", "approximate_median"),
+            ("stream_ms", "approximate_median"),
+            ("chars_respuesta", "mean"),
+            ("desde_cache_num", "mean"),
+            ("prompt_tokens", "sum"),
+            ("completion_tokens", "sum"),
+            ("ttft_ms", "count"),
+        ])
+
+    return result
+
+
+def _coerce(value, arrow_type):
+    if value is None:
+        return None
+    if pa.types.is_timestamp(arrow_type) and isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(root=None):
+    """Devuelve el almacén analítico del proceso (ANALYTICS_DIR o data/analytics)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AnalyticsStore(root or os.getenv("ANALYTICS_DIR", DEFAULT_ANALYTICS_DIR))
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacén analítico Parquet.")
+    parser.add_argument("--dir", help="Carpeta del almacén (por defecto ANALYTICS_DIR o data/analytics)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="Compacta las particiones cerradas (fechas anteriores a hoy)")
+    args = parser.parse_args()
+
+    # Sin compactación en segundo plano: este proceso solo ejecuta el comando
+    store = AnalyticsStore(args.dir or os.getenv("ANALYTICS_DIR", DEFAULT_ANALYTICS_DIR), compact_every=0)
+    if args.command == "compact":
+        merged = store.compact_closed()
+        print(f"✅ {merged} particiones compactadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
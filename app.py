@@ -0,0 +1,26 @@
+import streamlit as st
+import core  # Configuración y clientes compartidos: se inicializan una vez por proceso
+
+# --- APP MULTIPÁGINA ---
+#
+# Un solo proceso de Streamlit sirve todos los modos. Cada página es uno de los
+# scripts existentes y solo se ejecuta (e importa sus dependencias) cuando el
+# usuario la abre. Los scripts siguen funcionando solos con `streamlit run`.
+#
+# st.session_state es compartido entre páginas: cada página usa sus propias
+# claves (finguia_*, chat_*, interview_*) para no pisarse el historial.
+#
+# main_03.py no se monta: es la entrevista anterior, reemplazada por main_04.py
+# (mismos flujos de n8n), y usa claves sin prefijo (user_metadata,
+# questions_list, metadata_submitted) que chocarían con las otras páginas.
+# Sigue disponible por separado con `streamlit run main_03.py`.
+
+st.set_page_config(page_title="Tech Ideas", page_icon="🚀")
+
+pages = st.navigation([
+    st.Page("main_02.py", title="Chat Tech Ideas", icon="💬", url_path="chat", default=True),
+    st.Page("main_04.py", title="Entrevista", icon="💡", url_path="entrevista"),
+    st.Page("main_01.py", title="FinguIA", icon="📊", url_path="finguia"),
+    st.Page("dashboard.py", title="Analítica", icon="📈", url_path="analitica"),
+])
+pages.run()
@@ -0,0 +1,100 @@
+"""
+Benchmark del almacén analítico: genera N sesiones sintéticas, las escribe como lo
+hace la app (append + un vaciado cada --batch eventos, en orden de llegada) y mide
+los agregados del dashboard antes y después de compactar las particiones cerradas.
+
+Uso:
+    python bench_analytics.py --rows 200000 --batch 50
+"""
+import os
+import time
+import argparse
+import datetime
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+
+from analytics_store import AnalyticsStore, summarize
+
+ROLES = ["Director", "Gerente", "Coordinador", "Analista"]
+AREAS = ["Finanzas", "IT", "Ventas", "Marketing", "General"]
+
+
+def synthetic_sessions(rows, days, rng):
+    start = datetime.datetime.now() - datetime.timedelta(days=days)
+    offsets = rng.integers(0, days * 86400, rows)
+    inicio = np.datetime64(start, "us") + offsets.astype("timedelta64[s]")
+    duracion = rng.gamma(2.0, 300.0, rows)
+    return pa.table({
+        "session_id": pa.array([f"s{i}" for i in range(rows)]),
+        "app": pa.array(rng.choice(["main_02", "main_04"], rows)),
+        "nombre_id": pa.array([f"u{i % 5000}" for i in range(rows)]),
+        "rol_jerarquico": pa.array(rng.choice(ROLES, rows)),
+        "timestamp_inicio": pa.array(inicio),
+        "timestamp_fin": pa.array(inicio + (duracion * 1e6).astype("timedelta64[us]")),
+        "duracion_seg": pa.array(duracion),
+        "mensajes": pa.array(rng.integers(1, 40, rows).astype("int32")),
+        "chars_usuario": pa.array(rng.integers(10, 4000, rows).astype("int32")),
+        "chars_asistente": pa.array(rng.integers(100, 20000, rows).astype("int32")),
+        "fecha": pa.array(np.datetime_as_string(inicio, unit="D")),
+        "area": pa.array(rng.choice(AREAS, rows)),
+    })
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+    return result
+
+
+def count_files(root):
+    return sum(1 for _, _, files in os.walk(root) for f in files if f.endswith(".parquet"))
+
+
+def write_like_app(store, table, batch):
+    """Encola las sesiones en orden de fin y vacía cada `batch` eventos, como el hilo escritor."""
+    events = table.sort_by("timestamp_fin").drop_columns(["fecha"]).rename_columns(
+        [("area_proceso" if name == "area" else name) for name in table.column_names if name != "fecha"]
+    ).to_pylist()
+    for start in range(0, len(events), batch):
+        for event in events[start:start + batch]:
+            store.append("sessions", event)
+        store.flush()
+
+
+def run_queries(store):
+    today = datetime.date.today()
+    timed("  Todo el rango, todas las áreas", lambda: summarize(store))
+    timed("  Últimos 30 días, todas las áreas", lambda: summarize(store, today - datetime.timedelta(days=30), today))
+    timed("  Últimos 30 días, Finanzas", lambda: summarize(store, today - datetime.timedelta(days=30), today, ["Finanzas"]))
+    return timed("  Últimos 7 días, Finanzas + IT", lambda: summarize(store, today - datetime.timedelta(days=7), today, ["Finanzas", "IT"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--batch", type=int, default=50, help="Eventos por vaciado (la app vacía cada 10 s o 500 eventos)")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_analytics_")
+    table = synthetic_sessions(args.rows, args.days, np.random.default_rng(42))
+    # Sin compactación en segundo plano: se compacta explícitamente más abajo
+    store = AnalyticsStore(root, compact_every=0)
+    timed(f"Escritura ({args.batch} eventos por vaciado)", lambda: write_like_app(store, table, args.batch))
+    print(f"{args.rows:,} sesiones sintéticas en {root}: {count_files(root):,} archivos\n")
+
+    print("Sin compactar:")
+    run_queries(store)
+    merged = timed("\nCompactación de particiones cerradas", store.compact_closed)
+    print(f"{merged:,} particiones compactadas: {count_files(root):,} archivos\n")
+    print("Compactado:")
+    result = run_queries(store)
+    print()
+    print(result["sesiones_por_rol_area"].to_pandas())
+
+
+if __name__ == "__main__":
+    main()
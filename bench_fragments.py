@@ -0,0 +1,331 @@
+"""
+Mide ejecuciones de script y CPU del servidor por interacción, contra un
+servidor Streamlit real (los fragmentos no se pueden medir con AppTest, que
+siempre re-ejecuta el script completo).
+
+Se levanta `streamlit run <script>` con n8n y OpenAI simulados por un servidor
+HTTP local, y un cliente habla el protocolo del navegador por websocket
+(BackMsg/ForwardMsg). Por cada interacción se cuenta cuántas ejecuciones hubo
+(completas o solo de fragmento), cuántos elementos se reenviaron y cuánto CPU
+consumió el proceso del servidor.
+
+Uso:
+    python bench_fragments.py                    # árbol de trabajo actual
+    python bench_fragments.py --ref HEAD~1       # compara contra otra revisión de git
+    python bench_fragments.py --scenario entrevista --answers 10
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_PORT = 8650
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+# Tras el fin de una ejecución se espera este tiempo por si el servidor encadena otra
+SETTLE_SECONDS = 0.3
+
+
+# --- 1. BACKENDS SIMULADOS (n8n y OpenAI por HTTP) ---
+
+class StubBackendHandler(BaseHTTPRequestHandler):
+    questions = [
+        {"id_pregunta": f"Q{i:02d}", "pregunta_texto": f"Pregunta simulada número {i}", "rol_jerarquico": "Todos", "area_proceso": "Todos"}
+        for i in range(1, 31)
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/fetch":
+            if payload.get("tipo_evento") == "SYNC_PREGUNTAS":
+                return self._json({"version": "bench-1", "full": True, "questions": self.questions})
+            if payload.get("tipo_evento") == "PAGINA_PREGUNTAS":
+                start = (payload["page"] - 1) * payload["page_size"]
+                page = self.questions[start:start + payload["page_size"]]
+                return self._json({"questions": page, "has_more": start + len(page) < len(self.questions), "total": len(self.questions)})
+            return self._json(self.questions)
+        if self.path == "/v1/chat/completions":
+            return self._stream_completion(payload)
+        if payload.get("tipo_evento") == "LOTE_RESPUESTAS":
+            return self._json({"resultados": [{"id_pregunta": r["id_pregunta"], "status": "ok"} for r in payload["respuestas"]]})
+        return self._json({"status": "success"})
+
+    def _stream_completion(self, payload):
+        # Respuesta determinista en formato SSE de chat.completions
+        words = [f"respuesta{len(payload.get('messages', []))}"] + ["simulada"] * 40
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in words:
+            chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": payload.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            prompt_tokens = sum(len(m.get("content", "").split()) for m in payload.get("messages", []))
+            usage = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": payload.get("model"), "choices": [],
+                     "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}}
+            self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def start_stub_backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackendHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- 2. SERVIDOR STREAMLIT ---
+
+def export_tree(ref):
+    """Extrae una revisión de git a un directorio temporal."""
+    target = tempfile.mkdtemp(prefix="bench_fragments_tree_")
+    archive = subprocess.run(["git", "archive", ref], cwd=REPO_DIR, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", target], input=archive.stdout, check=True)
+    return target
+
+
+def server_env(backend_url, data_dir):
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{backend_url}/v1",
+        "DEEPSEEK_API_KEY": "sk-bench",
+        "N8N_WEBHOOK_URL": f"{backend_url}/session",
+        "N8N_URL_FETCH_Q": f"{backend_url}/fetch",
+        "N8N_URL_SAVE_A": f"{backend_url}/save",
+        "SHARED_CACHE_URL": f"sqlite:///{os.path.join(data_dir, 'cache.sqlite3')}",
+        "ANALYTICS_DIR": os.path.join(data_dir, "analytics"),
+        "TRANSCRIPTS_DIR": os.path.join(data_dir, "transcripts"),
+        "QUESTION_BANK_PATH": os.path.join(data_dir, "bank.json"),
+        "TECH_IDEAS_PROFILE": "",
+        "TECH_IDEAS_RECORD_TRACES": "",
+    }
+
+
+def start_server(tree, script, port, env):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", script, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=tree, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    start = time.perf_counter()
+    while time.perf_counter() - start < 60:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{script} no arrancó en 60 s")
+
+
+def cpu_ms(pid):
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) * 1000 / CLK_TCK
+
+
+# --- 3. CLIENTE DEL PROTOCOLO DEL NAVEGADOR ---
+
+class BrowserSession:
+    """Imita al frontend: envía rerun_script con el estado de los widgets y lee los deltas."""
+
+    def __init__(self, ws, server_pid):
+        self.ws = ws
+        self.server_pid = server_pid
+        self.widgets = {}   # etiqueta -> (tipo, id, fragment_id)
+        self.values = {}    # id -> WidgetState con el último valor enviado
+
+    def find(self, label_prefix):
+        for label, widget in self.widgets.items():
+            if label.startswith(label_prefix):
+                return widget
+        raise KeyError(f"No hay widget con etiqueta '{label_prefix}'. Visibles: {list(self.widgets)}")
+
+    def set_text(self, label_prefix, text):
+        _, widget_id, _ = self.find(label_prefix)
+        self.values[widget_id] = WidgetState(id=widget_id, string_value=text)
+
+    def click(self, label_prefix):
+        _, widget_id, fragment_id = self.find(label_prefix)
+        return self.interact([WidgetState(id=widget_id, trigger_value=True)], fragment_id)
+
+    def chat(self, placeholder_prefix, text):
+        _, widget_id, fragment_id = self.find(placeholder_prefix)
+        state = WidgetState(id=widget_id)
+        state.chat_input_value.data = text
+        return self.interact([state], fragment_id)
+
+    def load(self):
+        return self.interact([], "")
+
+    def interact(self, triggers, fragment_id):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(list(self.values.values()) + triggers)
+
+        cpu_start = cpu_ms(self.server_pid)
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        stats = {"ejecuciones": 0, "completas": 0, "fragmento": 0, "elementos": 0, "bytes": 0}
+        finished_at = None
+        while True:
+            try:
+                raw = self.ws.recv(timeout=None if finished_at is None else SETTLE_SECONDS)
+            except TimeoutError:
+                break
+            stats["bytes"] += len(raw)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                stats["ejecuciones"] += 1
+                if not fwd.new_session.fragment_ids_this_run:
+                    self.widgets = {}
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                stats["elementos"] += 1
+                self._register(fwd.delta.new_element, fwd.delta.fragment_id)
+            elif kind == "script_finished":
+                status = fwd.script_finished
+                if status == ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                    stats["fragmento"] += 1
+                elif status == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    stats["completas"] += 1
+                if status != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    finished_at = time.perf_counter()
+        stats["ms"] = (finished_at - start) * 1000
+        stats["cpu_ms"] = cpu_ms(self.server_pid) - cpu_start
+        return stats
+
+    def _register(self, element, fragment_id):
+        kind = element.WhichOneof("type")
+        if kind in ("button", "text_area", "text_input", "selectbox"):
+            proto = getattr(element, kind)
+            self.widgets[proto.label] = (kind, proto.id, fragment_id)
+        elif kind == "chat_input":
+            self.widgets[element.chat_input.placeholder] = (kind, element.chat_input.id, fragment_id)
+
+
+# --- 4. ESCENARIOS ---
+
+def scenario_entrevista(session, answers):
+    steps = [("load", session.load())]
+    session.set_text("👤 Nombre / ID", "BENCH_USER")
+    steps.append(("metadata", session.click("🚀 Comenzar la Entrevista")))
+    for i in range(answers):
+        session.set_text("Su Respuesta", f"Respuesta de prueba número {i} con suficiente detalle.")
+        steps.append(("answer", session.click("Guardar Respuesta y Siguiente")))
+    return steps
+
+
+def scenario_chat(session, answers):
+    steps = [("load", session.load())]
+    session.set_text("👤 Nombre / ID", "BENCH_USER")
+    steps.append(("metadata", session.click("🚀 Comenzar la Sesión")))
+    for i in range(answers):
+        steps.append(("chat", session.chat("Escribe tu respuesta", f"Mensaje de prueba número {i}")))
+    steps.append(("finish", session.click("👋 Finalizar Sesión")))
+    return steps
+
+
+SCENARIOS = {
+    "entrevista": ("main_04.py", scenario_entrevista),
+    "chat": ("main_02.py", scenario_chat),
+}
+
+
+def run_scenario(tree, name, answers, port, backend_url):
+    script, scenario = SCENARIOS[name]
+    data_dir = tempfile.mkdtemp(prefix="bench_fragments_data_")
+    proc = start_server(tree, script, port, server_env(backend_url, data_dir))
+    try:
+        with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"]) as ws:
+            return scenario(BrowserSession(ws, proc.pid), answers)
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+# --- 5. REPORTE ---
+
+def totals(steps, actions):
+    selected = [s for action, s in steps if action in actions]
+    keys = ("ejecuciones", "completas", "fragmento", "elementos", "cpu_ms", "ms")
+    return {k: sum(s[k] for s in selected) / max(len(selected), 1) for k in keys}
+
+
+def print_steps(label, steps):
+    print(f"--- {label} ---")
+    print(f"{'paso':>4} {'acción':<9} {'ejec.':>5} {'compl.':>6} {'frag.':>5} {'elem.':>6} {'CPU ms':>8} {'ms':>8}")
+    for i, (action, s) in enumerate(steps):
+        print(f"{i:>4} {action:<9} {s['ejecuciones']:>5} {s['completas']:>6} {s['fragmento']:>5} "
+              f"{s['elementos']:>6} {s['cpu_ms']:>8.0f} {s['ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuciones de script y CPU del servidor por interacción (servidor Streamlit real).")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append", help="Escenario a medir (por defecto, todos)")
+    parser.add_argument("--answers", type=int, default=5, help="Respuestas/mensajes por escenario")
+    parser.add_argument("--ref", help="Revisión de git con la que comparar (p. ej. HEAD~1)")
+    parser.add_argument("--out", help="Escribe los resultados en JSON")
+    args = parser.parse_args()
+
+    backend, backend_url = start_stub_backend()
+    trees = {"actual": REPO_DIR}
+    if args.ref:
+        trees = {args.ref: export_tree(args.ref), **trees}
+
+    results = {}
+    for t, (label, tree) in enumerate(trees.items()):
+        for s, name in enumerate(args.scenario or sorted(SCENARIOS)):
+            steps = run_scenario(tree, name, args.answers, BASE_PORT + t * 10 + s, backend_url)
+            results.setdefault(name, {})[label] = steps
+            print_steps(f"{name} ({label})", steps)
+            print()
+
+    interaction = {"entrevista": {"answer"}, "chat": {"chat"}}
+    print("--- Promedio por interacción (respuesta / mensaje) ---")
+    print(f"{'escenario':<11} {'árbol':<10} {'ejec.':>6} {'compl.':>6} {'frag.':>6} {'elem.':>6} {'CPU ms':>8} {'ms':>8}")
+    for name, by_tree in results.items():
+        for label, steps in by_tree.items():
+            avg = totals(steps, interaction[name])
+            print(f"{name:<11} {label:<10} {avg['ejecuciones']:>6.1f} {avg['completas']:>6.1f} {avg['fragmento']:>6.1f} "
+                  f"{avg['elementos']:>6.1f} {avg['cpu_ms']:>8.1f} {avg['ms']:>8.1f}")
+
+    backend.shutdown()
+    if args.ref:
+        shutil.rmtree(trees[args.ref], ignore_errors=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
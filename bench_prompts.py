@@ -0,0 +1,188 @@
+"""
+Compara las variantes del prompt base (prompt_variants.py) sin tocar la app.
+
+Por variante reporta tokens del prompt y, según el modo, latencia y longitud
+de respuesta:
+
+    python bench_prompts.py                          # proveedor simulado (modelo de latencia)
+    python bench_prompts.py --record runs.jsonl      # llama al proveedor real y graba cada respuesta
+    python bench_prompts.py --recorded runs.jsonl    # resume una grabación previa
+
+El modo simulado estima la latencia con un costo fijo más un costo de prefill
+por token de prompt (los parámetros se pueden ajustar con --base-ms y
+--prefill-ms-per-1k). Las respuestas grabadas sirven para comparar el largo de
+las respuestas entre variantes antes de cambiar la variante en producción.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import prompt_variants
+
+# Preguntas representativas (dentro y fuera de dominio)
+SAMPLE_QUESTIONS = [
+    "¿Cómo calculo el ROIC de una empresa y por qué importa?",
+    "Compara el margen operativo de dos aerolíneas.",
+    "¿Qué es el free cash flow y cómo se relaciona con el CAPEX?",
+    "No sé por dónde empezar a analizar una empresa.",
+    "¿Cuál es el precio de un vuelo a Madrid?",
+]
+
+
+# --- 1. PROVEEDORES ---
+
+def stub_provider(variant_text, question, base_ms, prefill_ms_per_1k):
+    """Latencia modelada: costo fijo + prefill proporcional a los tokens del prompt."""
+    prompt_tokens = prompt_variants.count_tokens(variant_text) + prompt_variants.count_tokens(question)
+    ttft_ms = base_ms + prompt_tokens * prefill_ms_per_1k / 1000
+    return {"prompt_tokens": prompt_tokens, "ttft_ms": ttft_ms, "total_ms": ttft_ms, "answer_chars": None}
+
+
+def real_provider(app):
+    """Devuelve una función que consulta el modelo real de la app (main_01 → DeepSeek, main_02 → OpenAI)."""
+    from openai import OpenAI
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    if app == "main_01":
+        client = OpenAI(api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com/v1")
+        model, system_role = "deepseek-chat", "assistant"
+    else:
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        model, system_role = "gpt-5-mini", "system"
+
+    def call(variant_text, question):
+        messages = [{"role": system_role, "content": variant_text}, {"role": "user", "content": question}]
+        start = time.perf_counter()
+        ttft_ms, parts, usage = None, [], None
+        stream = client.chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                parts.append(chunk.choices[0].delta.content)
+        answer = "".join(parts)
+        return {
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+            "ttft_ms": ttft_ms,
+            "total_ms": (time.perf_counter() - start) * 1000,
+            "answer_chars": len(answer),
+            "answer_words": len(answer.split()),
+            "answer": answer,
+        }
+
+    return call
+
+
+# --- 2. MODOS ---
+
+def run_stub(args):
+    variants = prompt_variants.build_all()
+    rows = []
+    for variant, info in variants.items():
+        for question in SAMPLE_QUESTIONS:
+            rows.append({"variant": variant, "question": question,
+                         **stub_provider(info["text"], question, args.base_ms, args.prefill_ms_per_1k)})
+    return rows
+
+
+def run_record(args):
+    call = real_provider(args.app)
+    variants = prompt_variants.build_all()
+    rows = []
+    with open(args.record, "a", encoding="utf-8") as f:
+        for variant, info in variants.items():
+            for question in SAMPLE_QUESTIONS:
+                for _ in range(args.repeat):
+                    row = {"variant": variant, "app": args.app, "question": question, **call(info["text"], question)}
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    f.flush()
+                    rows.append(row)
+                    print(f"{variant:<8} {row['ttft_ms'] or 0:>7.0f} ms TTFT  {row['answer_chars']:>5} caracteres  {question[:40]}")
+    return rows
+
+
+def load_recorded(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- 3. REPORTE ---
+
+def _median(rows, field):
+    values = [r[field] for r in rows if r.get(field) is not None]
+    return statistics.median(values) if values else None
+
+
+def summarize(rows):
+    variants = prompt_variants.build_all()
+    summary = {}
+    for variant in prompt_variants.VARIANTS:
+        subset = [r for r in rows if r["variant"] == variant]
+        if not subset:
+            continue
+        summary[variant] = {
+            "tokens_prompt_variante": variants[variant]["tokens"],
+            "muestras": len(subset),
+            "prompt_tokens_p50": _median(subset, "prompt_tokens"),
+            "ttft_ms_p50": _median(subset, "ttft_ms"),
+            "total_ms_p50": _median(subset, "total_ms"),
+            "caracteres_respuesta_p50": _median(subset, "answer_chars"),
+        }
+    return summary
+
+
+def _fmt(value, width, spec):
+    return "—".rjust(width) if value is None else format(value, f">{width}{spec}")
+
+
+def print_summary(summary):
+    full = summary.get("full", {})
+    print(f"\n{'variante':<9} {'tokens':>7} {'vs full':>8} {'TTFT p50':>10} {'total p50':>10} {'respuesta p50':>14}")
+    for variant, s in summary.items():
+        ratio = s["tokens_prompt_variante"] / full["tokens_prompt_variante"] if full else None
+        print(f"{variant:<9} {s['tokens_prompt_variante']:>7} {_fmt(ratio, 8, '.0%')} "
+              f"{_fmt(s['ttft_ms_p50'], 8, '.0f')}ms {_fmt(s['total_ms_p50'], 8, '.0f')}ms "
+              f"{_fmt(s['caracteres_respuesta_p50'], 14, '.0f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara variantes del prompt base: tokens, latencia y largo de respuesta.")
+    parser.add_argument("--record", metavar="JSONL", help="Llama al proveedor real y agrega cada respuesta a este archivo")
+    parser.add_argument("--recorded", metavar="JSONL", help="Resume una grabación previa en lugar de llamar al proveedor")
+    parser.add_argument("--app", choices=["main_01", "main_02"], default="main_02", help="Proveedor/rol de sistema a usar con --record")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por pregunta y variante con --record")
+    parser.add_argument("--base-ms", type=float, default=250.0, help="Costo fijo por llamada del proveedor simulado")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=120.0, help="Costo de prefill por 1000 tokens del proveedor simulado")
+    parser.add_argument("--out", help="Escribe el resumen en JSON")
+    args = parser.parse_args()
+
+    if args.record and args.recorded:
+        parser.error("--record y --recorded son excluyentes")
+
+    if args.recorded:
+        rows = load_recorded(args.recorded)
+    elif args.record:
+        rows = run_record(args)
+    else:
+        print("Proveedor simulado: latencia = base + prefill por token (sin largo de respuesta).")
+        rows = run_stub(args)
+
+    summary = summarize(rows)
+    print_summary(summary)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
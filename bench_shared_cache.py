@@ -0,0 +1,87 @@
+"""
+Benchmark multiproceso de la caché compartida.
+
+Simula N procesos de Streamlit en el mismo host leyendo y escribiendo la misma
+caché (90% lecturas, 10% escrituras por defecto) y reporta el throughput total
+para 1, 2, 4, ... hasta el número de núcleos.
+
+Uso:
+    python bench_shared_cache.py
+    python bench_shared_cache.py --seconds 5 --write-ratio 0.2
+    SHARED_CACHE_URL=redis://localhost:6379/0 python bench_shared_cache.py
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+import shared_cache
+
+
+def worker(url, seconds, write_ratio, keys, result_queue):
+    cache = shared_cache.get_cache(url)
+    rng = random.Random(os.getpid())
+    payload = {"role": "assistant", "content": "x" * 512}
+
+    ops = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        key = f"k{rng.randrange(keys)}"
+        if rng.random() < write_ratio:
+            cache.set("llm", key, payload)
+        else:
+            cache.get("llm", key)
+        ops += 1
+    result_queue.put(ops)
+
+
+def run(url, workers, seconds, write_ratio, keys):
+    # "spawn": cada proceso abre sus propias conexiones, como un worker de Streamlit real
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(url, seconds, write_ratio, keys, result_queue))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    total = sum(result_queue.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    url = os.getenv("SHARED_CACHE_URL")
+    if not url:
+        tmp_dir = tempfile.mkdtemp(prefix="bench_cache_")
+        url = f"sqlite:///{os.path.join(tmp_dir, 'cache.sqlite3')}"
+
+    # Precarga para que las lecturas encuentren datos
+    cache = shared_cache.get_cache(url)
+    for i in range(args.keys):
+        cache.set("llm", f"k{i}", {"role": "assistant", "content": "x" * 512})
+
+    print(f"Backend: {url} | escrituras: {args.write_ratio:.0%} | {args.seconds}s por corrida\n")
+    print(f"{'procesos':>8} {'ops/s':>12} {'escalado':>9}")
+
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        throughput = run(url, workers, args.seconds, args.write_ratio, args.keys)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>12,.0f} {throughput / baseline:>8.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Mide arranque y memoria: scripts separados vs. la app multipágina (app.py).
+
+1. Servidor: tiempo hasta que /_stcore/health responde y RSS del proceso,
+   para N servidores (uno por script) frente a un solo servidor con app.py.
+2. Páginas cargadas: RSS tras ejecutar cada página una vez (AppTest), con un
+   proceso por script frente a un solo proceso que recorre todas las páginas.
+
+Uso:
+    python bench_startup.py
+"""
+import os
+import sys
+import time
+import json
+import tempfile
+import subprocess
+import urllib.request
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = ["main_01.py", "main_02.py", "main_04.py", "dashboard.py"]
+BASE_PORT = 8600
+
+
+def bench_env():
+    tmp_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench"),
+        "DEEPSEEK_API_KEY": os.getenv("DEEPSEEK_API_KEY", "sk-bench"),
+        "SHARED_CACHE_URL": f"sqlite:///{os.path.join(tmp_dir, 'cache.sqlite3')}",
+        "ANALYTICS_DIR": os.path.join(tmp_dir, "analytics"),
+        "TRANSCRIPTS_DIR": os.path.join(tmp_dir, "transcripts"),
+        "QUESTION_BANK_PATH": os.path.join(tmp_dir, "bank.json"),
+    }
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_server(script, port, env):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", script, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    start = time.perf_counter()
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.05)
+        if time.perf_counter() - start > 60:
+            proc.kill()
+            raise RuntimeError(f"{script} no arrancó en 60 s")
+
+
+def bench_servers(env):
+    results = {}
+    for label, scripts in (("separados", SCRIPTS), ("multipágina", ["app.py"])):
+        procs, boot = [], []
+        for i, script in enumerate(scripts):
+            proc, seconds = start_server(script, BASE_PORT + i, env)
+            procs.append(proc)
+            boot.append(seconds)
+        results[label] = {"procesos": len(procs), "arranque_s": max(boot), "rss_mb": sum(rss_mb(p.pid) for p in procs)}
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+# Se ejecuta en un subproceso limpio: carga las páginas con AppTest y reporta RSS
+PAGE_LOADER = r"""
+import os, sys, json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+pages = json.loads(sys.argv[1])
+if pages[0] == "app.py":
+    at = AppTest.from_file("app.py", default_timeout=120).run()
+    for page in pages[1:]:
+        at.switch_page(page).run()
+else:
+    at = AppTest.from_file(pages[0], default_timeout=120).run()
+assert not at.exception, at.exception
+with open(f"/proc/{os.getpid()}/status") as f:
+    rss = next(int(l.split()[1]) / 1024 for l in f if l.startswith("VmRSS:"))
+print(json.dumps({"rss_mb": rss, "carga_s": time.perf_counter() - start}))
+"""
+
+
+def load_pages(pages, env):
+    out = subprocess.run([sys.executable, "-c", PAGE_LOADER, json.dumps(pages)],
+                         cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_pages(env):
+    separate = [load_pages([script], env) for script in SCRIPTS]
+    unified = load_pages(["app.py"] + [s for s in SCRIPTS if s != "main_02.py"], env)
+    return {
+        "separados": {"procesos": len(separate), "carga_s": sum(r["carga_s"] for r in separate),
+                      "rss_mb": sum(r["rss_mb"] for r in separate)},
+        "multipágina": {"procesos": 1, **unified},
+    }
+
+
+def main():
+    env = bench_env()
+
+    print("--- Servidor (hasta /_stcore/health) ---")
+    for label, r in bench_servers(env).items():
+        print(f"{label:<12} procesos={r['procesos']}  arranque={r['arranque_s']:.2f}s  RSS total={r['rss_mb']:.0f} MB")
+
+    print("\n--- Todas las páginas cargadas una vez ---")
+    for label, r in bench_pages(env).items():
+        print(f"{label:<12} procesos={r['procesos']}  carga={r['carga_s']:.2f}s  RSS total={r['rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
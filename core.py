@@ -0,0 +1,182 @@
+import os
+import json
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+import profiler
+
+# --- NÚCLEO COMPARTIDO DE LA APP ---
+#
+# Configuración, clientes y utilidades comunes a todas las páginas (chat,
+# chat contextualizado, entrevista, analítica). Al vivir en un módulo, se
+# inicializan una sola vez por proceso y las páginas solo las reutilizan.
+
+# --- 1. CONFIGURACIÓN ---
+
+load_dotenv(override=True)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+
+MODEL_OPENAI = "gpt-5-mini"
+MODEL_DEEPSEEK = "deepseek-chat"
+
+# Webhooks de n8n
+N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL") # Eventos de sesión del chat
+N8N_URL_FETCH_Q = os.getenv("N8N_URL_FETCH_Q") # Para obtener preguntas
+N8N_URL_SAVE_A = os.getenv("N8N_URL_SAVE_A")   # Para guardar respuestas
+
+# Banco de preguntas local (espejo versionado de n8n)
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "data/question_bank.json")
+QUESTION_BANK_SYNC_SECONDS = int(os.getenv("QUESTION_BANK_SYNC_SECONDS", "300"))
+# Tamaño de página cuando las preguntas se piden paginadas a n8n (banco local vacío)
+QUESTION_PAGE_SIZE = int(os.getenv("QUESTION_PAGE_SIZE", "10"))
+
+# ID de usuario por defecto para pruebas
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "TEST_USER_A")
+
+# Conexiones HTTP reutilizables hacia n8n (por proceso)
+WEBHOOK_POOL_SIZE = int(os.getenv("WEBHOOK_POOL_SIZE", "20"))
+
+ROLE_OPTIONS = ["Director", "Gerente", "Coordinador", "Analista"]
+AREA_OPTIONS = ["Finanzas", "IT", "Ventas", "Marketing", "General"]
+
+# --- 2. CLIENTES COMPARTIDOS ---
+
+@st.cache_resource
+def get_openai_client():
+    """Cliente de OpenAI único por proceso (el import pesado se hace al primer uso)."""
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+@st.cache_resource
+def get_deepseek_client():
+    """Cliente de DeepSeek (API compatible con OpenAI) único por proceso."""
+    from openai import OpenAI
+    return OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
+
+@st.cache_resource
+def get_webhook_session():
+    """Sesión HTTP con pool de conexiones keep-alive hacia n8n."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=WEBHOOK_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# --- 3. COMUNICACIÓN CON N8N ---
+
+def send_to_n8n(url_variable_name, url, data):
+    """
+    Función unificada para enviar datos a n8n, incluyendo verificación de URL y manejo de errores.
+    Retorna el JSON de la respuesta (puede ser {} o []) o None si falló: comparar con `is not None`.
+    """
+    response_data = None
+
+    # === PUNTO DE DIAGNÓSTICO DE CONEXIÓN CRÍTICO ===
+    print(f"\n--- DEBUG: INTENTANDO CONECTAR A {url_variable_name} ---")
+    print(f"URL cargada: {url}")
+    print("---------------------------------------------------\n")
+
+    # 1. VERIFICACIÓN DE URL: Estricto control de URLs placeholder.
+    if not url or "<Webhook URL" in url:
+        error_message = f"La URL para la variable `{url_variable_name}` es inválida o aún contiene el placeholder."
+        notify("error", f"❌ CONFIGURACIÓN CRÍTICA FALLIDA: {error_message}")
+        notify("caption", "Verifica el archivo `.env`. Asegúrate de que las URLs de n8n estén **CORRECTAS y en modo Production**.")
+        return None
+
+    try:
+        with profiler.phase("webhook"):
+            response = get_webhook_session().post(url, json=data, timeout=10)
+
+        if response.status_code >= 200 and response.status_code < 300:
+            if response.content:
+                try:
+                    response_data = response.json()
+                except json.JSONDecodeError:
+                    response_data = {"status": "success"}
+            else:
+                response_data = {"status": "success"}
+
+        else:
+            # Muestra el error de n8n (HTTP 4xx/5xx)
+            notify("error", f"❌ Error de n8n en `{url_variable_name}`. Código: {response.status_code}. Mensaje: {response.text[:200]}...")
+
+    except requests.exceptions.RequestException as e:
+        # Muestra el error de conexión (sin servicio, timeout, etc.)
+        notify("error", f"❌ Error de conexión al Webhook `{url_variable_name}`: {e}. Asegúrate de que el servidor de n8n esté activo y la URL sea accesible.")
+
+    return response_data
+
+# --- 4. AVISOS DESDE CALLBACKS ---
+#
+# Un callback disparado desde un st.fragment no debe dibujar elementos (Streamlit
+# los pondría arriba de la app). Los callbacks se decoran con `fragment_callback`
+# y sus avisos se guardan hasta el siguiente render (`show_notices`).
+
+_callback_state = threading.local()
+
+@contextmanager
+def deferred_notices():
+    """Guarda los avisos emitidos dentro del bloque (p. ej. justo antes de un st.rerun)."""
+    _callback_state.active = True
+    try:
+        yield
+    finally:
+        _callback_state.active = False
+
+def fragment_callback(func):
+    """Decorador para callbacks on_click/on_change de widgets dentro de un fragmento."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with deferred_notices():
+            return func(*args, **kwargs)
+    return wrapper
+
+def notify(kind, message, **kwargs):
+    """st.<kind>(message) ahora, o al siguiente render si se llama dentro de un callback de fragmento."""
+    if getattr(_callback_state, "active", False):
+        st.session_state.setdefault("pending_notices", []).append((kind, message, kwargs))
+    else:
+        getattr(st, kind)(message, **kwargs)
+
+def show_notices():
+    """Muestra (y descarta) los avisos pendientes de callbacks anteriores."""
+    for kind, message, kwargs in st.session_state.pop("pending_notices", []):
+        getattr(st, kind)(message, **kwargs)
+
+# --- 5. INTERFAZ COMÚN ---
+
+def show_metadata_form(submit_label, default_user_id=""):
+    """
+    Muestra el formulario inicial de recolección de metadatos.
+    Retorna el dict de metadatos al enviarse con datos válidos; None en otro caso.
+    """
+    st.title("🚀 Tech Ideas - Consultora de Ideas de Tecnología")
+    st.subheader("Paso 1: Identificate")
+
+    with st.form(key='metadata_form', clear_on_submit=False):
+
+        user_id = st.text_input("👤 Nombre / ID", key="form_user_id", value=default_user_id, help="Su nombre completo o ID único para seguimiento.")
+        role = st.selectbox("🎯 Rol Jerárquico", options=ROLE_OPTIONS, key="form_role")
+        area = st.selectbox("📊 Área de Proceso", options=AREA_OPTIONS, key="form_area")
+
+        submit_button = st.form_submit_button(label=submit_label)
+
+    if not submit_button:
+        return None
+    if not user_id:
+        st.warning("⚠️ Por favor, ingrese su Nombre/ID para continuar.")
+        return None
+
+    return {
+        "nombre_id": user_id,
+        "rol_jerarquico": role,
+        "area_proceso": area,
+        "timestamp_inicio": datetime.datetime.now().isoformat()
+    }
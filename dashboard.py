@@ -0,0 +1,94 @@
+import datetime
+import streamlit as st
+from analytics_store import get_store, summarize
+from token_budget import get_scheduler
+import core
+
+# --- 1. CONFIGURACIÓN ---
+
+analytics = get_store()
+
+# --- 2. CARGA Y AGREGACIÓN ---
+
+@st.cache_data(ttl=60, show_spinner="Calculando agregados...")
+def load_summary(fecha_desde, fecha_hasta, areas):
+    """Agrega con Arrow (solo particiones y columnas filtradas) y convierte a pandas el resultado pequeño."""
+    return {name: table.to_pandas() for name, table in summarize(analytics, fecha_desde, fecha_hasta, list(areas)).items()}
+
+# --- 3. INTERFAZ ---
+
+st.title("📈 Tech Ideas - Analítica de Sesiones")
+st.caption("Sesiones, respuestas y métricas de streaming desde el almacén Parquet local.")
+
+today = datetime.date.today()
+date_range = st.sidebar.date_input(
+    "📅 Rango de fechas",
+    value=(today - datetime.timedelta(days=30), today),
+)
+if len(date_range) != 2:
+    st.info("Seleccione la fecha final del rango.")
+    st.stop()
+fecha_desde, fecha_hasta = date_range
+areas = st.sidebar.multiselect("📊 Áreas", options=core.AREA_OPTIONS, default=[])
+if st.sidebar.button("🔄 Escribir eventos pendientes y recargar"):
+    analytics.flush()
+    load_summary.clear()
+
+# Cubetas del presupuesto de tokens de este proceso (en app.py, el mismo proceso que sirve el chat).
+# Solo rol y área: las cubetas por usuario expondrían el nombre_id de cada persona
+buckets = get_scheduler().snapshot(scopes=("rol_jerarquico", "area_proceso"))
+if buckets:
+    st.subheader("🪙 Presupuesto de tokens por minuto (en vivo)")
+    st.dataframe(buckets, width="stretch", hide_index=True)
+
+summary = load_summary(fecha_desde, fecha_hasta, tuple(areas))
+
+if not summary:
+    st.info("Aún no hay eventos en el rango seleccionado.")
+    st.stop()
+
+if "sesiones_por_rol_area" in summary:
+    sessions = summary["sesiones_por_rol_area"]
+    total = int(sessions["duracion_seg_count"].sum())
+    avg_min = (sessions["duracion_seg_mean"] * sessions["duracion_seg_count"]).sum() / total / 60
+
+    col1, col2 = st.columns(2)
+    col1.metric("Sesiones", f"{total:,}")
+    col2.metric("Duración promedio", f"{avg_min:.1f} min")
+
+    st.subheader("⏱️ Duración promedio de sesión (min) por Rol y Área")
+    pivot = sessions.pivot_table(index="rol_jerarquico", columns="area", values="duracion_seg_mean") / 60
+    st.dataframe(pivot.round(1), width="stretch")
+
+    st.subheader("📅 Sesiones por día")
+    st.bar_chart(summary["sesiones_por_dia"], x="fecha", y="duracion_seg_count")
+
+if "respuestas_por_rol_area" in summary:
+    st.subheader("📝 Respuestas de entrevista")
+    answers = summary["respuestas_por_rol_area"]
+    st.dataframe(
+        answers.rename(columns={
+            "chars_respuesta_mean": "caracteres (prom.)",
+            "palabras_respuesta_mean": "palabras (prom.)",
+            "id_pregunta_count": "respuestas",
+        }).round(1),
+        width="stretch",
+        hide_index=True,
+    )
+    st.bar_chart(summary["respuestas_por_pregunta"], x="id_pregunta", y="chars_respuesta_mean")
+
+if "streaming_por_area" in summary:
+    st.subheader("⚡ Streaming del LLM por Área")
+    st.dataframe(
+        summary["streaming_por_area"].rename(columns={
+            "ttft_ms_approximate_median": "TTFT p50 (ms)",
+            "stream_ms_approximate_median": "duración p50 (ms)",
+            "chars_respuesta_mean": "caracteres (prom.)",
+            "desde_cache_num_mean": "% desde caché",
+            "prompt_tokens_sum": "tokens prompt",
+            "completion_tokens_sum": "tokens respuesta",
+            "ttft_ms_count": "turnos",
+        }).round(2),
+        width="stretch",
+        hide_index=True,
+    )
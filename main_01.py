@@ -1,37 +1,46 @@
-import os
 import streamlit as st
-from dotenv import load_dotenv
-from openai import OpenAI
-from prompts import stronger_prompt
+import prompt_variants
+import profiler
+import session_trace
+import core
 
-load_dotenv(override=True)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+client_deepseek = core.get_deepseek_client()
+model_deepseek = core.MODEL_DEEPSEEK
 
-client_openai = OpenAI(api_key=OPENAI_API_KEY)
-client_deepseek = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
 
-model_openai = "gpt-5-mini"
-model_deepseek = "deepseek-chat"
+@st.fragment
+@profiler.fragment("main_01", "chat_panel")
+def show_chat_panel():
+    """Entrada de chat y turnos nuevos: cada mensaje re-ejecuta solo este fragmento."""
+    for msg in st.session_state.finguia_messages[st.session_state.get("finguia_messages_rendered", 0):]:
+        st.chat_message(msg["role"]).write(msg["content"])
 
-st.title("📊 FinguIA")
-st.caption("💰 Inversiones simplificadas.")
+    if prompt := st.chat_input(placeholder="Escribe tu mensaje aquí..."):
+        session_trace.record("main_01.py", "chat", text=prompt)
+        st.session_state.finguia_messages.append({"role": "user", "content": prompt})
+        st.chat_message("user").write(prompt)
+        conversation = [{"role": "assistant", "content": prompt_variants.get_prompt("main_01")}]
+        conversation.extend({"role": m["role"], "content":m["content"]} for m in st.session_state.finguia_messages)
 
-if "messages" not in st.session_state:
-    st.session_state["messages"] = [{"role": "assistant", "content": "¿En qué te puedo ayudar?"}]
+        with st.chat_message("assistant"), profiler.phase("llm"):
+            stream = client_deepseek.chat.completions.create(model=model_deepseek, messages=conversation, stream=True)
+            response = st.write_stream(stream)
 
-for msg in st.session_state.messages:
-    st.chat_message(msg["role"]).write(msg["content"])
+        st.session_state.finguia_messages.append({"role": "assistant", "content": response})
 
-if prompt := st.chat_input(placeholder="Escribe tu mensaje aquí..."):
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    st.chat_message("user").write(prompt)
-    conversation = [{"role": "assistant", "content": stronger_prompt}]
-    conversation.extend({"role": m["role"], "content":m["content"]} for m in st.session_state.messages)
 
-    with st.chat_message("assistant"):
-        stream = client_deepseek.chat.completions.create(model=model_deepseek, messages=conversation, stream=True)
-        response = st.write_stream(stream)
+with profiler.rerun("main_01"):
+    st.title("📊 FinguIA")
+    st.caption("💰 Inversiones simplificadas.")
 
-    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+    if "finguia_messages" not in st.session_state:
+        st.session_state["finguia_messages"] = [{"role": "assistant", "content": "¿En qué te puedo ayudar?"}]
+
+    # El historial se dibuja solo en los reruns completos; los turnos nuevos los dibuja el fragmento
+    for msg in st.session_state.finguia_messages:
+        st.chat_message(msg["role"]).write(msg["content"])
+    st.session_state["finguia_messages_rendered"] = len(st.session_state.finguia_messages)
+
+    show_chat_panel()
+
+    profiler.sidebar_panel()
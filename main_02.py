@@ -1,61 +1,52 @@
-import os
+import math
+import time
+import secrets
 import streamlit as st
-import requests
 import datetime
-from dotenv import load_dotenv
-from openai import OpenAI
-# Importa stronger_prompt, asumiendo que contiene las instrucciones base para la IA
-from prompts import stronger_prompt 
+# Prompt base en la variante configurada (full/compact/minimal, ver prompt_variants.py)
+import prompt_variants
+from shared_cache import get_cache, cache_key
+import profiler
+import session_trace
+from analytics_store import get_store
+from transcript_archive import get_archive
+from token_budget import get_scheduler
+import core
 
 # --- 1. CONFIGURACIÓN E INICIALIZACIÓN DE API ---
 
-load_dotenv(override=True)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-#DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-# URL del Webhook de n8n
-N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
+# Clientes, URLs y pool de conexiones vienen del núcleo compartido (uno por proceso)
+client_openai = core.get_openai_client()
+model_openai = core.MODEL_OPENAI
 
-# Inicialización de clientes
-#DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
-
-client_openai = OpenAI(api_key=OPENAI_API_KEY)
-#client_deepseek = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
-
-#model_deepseek = "deepseek-chat"
-model_openai = "gpt-5-mini"
+# Caché compartida entre procesos (SQLite local o Redis según SHARED_CACHE_URL)
+shared_cache = get_cache()
+# Almacén analítico local (Parquet particionado por fecha y área)
+analytics = get_store()
+# Archivo local de transcripciones finalizadas (auditoría, independiente de n8n)
+transcripts = get_archive()
+# Presupuesto de tokens por minuto por usuario, rol y área (por proceso)
+budget = get_scheduler()
+BASE_PROMPT = prompt_variants.get_prompt("main_02")
+PROMPT_VERSION = cache_key(BASE_PROMPT)
 
 # --- 2. FUNCIONES DE LÓGICA ---
 
 def send_to_n8n(data):
-    """Envía los datos (metadatos o sesión completa) al Webhook de n8n."""
-    if not N8N_WEBHOOK_URL:
-        st.error("❌ La URL del Webhook de n8n no está configurada. Por favor, revisa tu archivo .env.")
-        return False
-
-    try:
-        # Envía los datos como JSON
-        response = requests.post(N8N_WEBHOOK_URL, json=data)
-
-        if response.status_code >= 200 and response.status_code < 300:
-            # st.success se muestra solo en la función de inicio, no aquí
-            return True
-        else:
-            st.error(f"❌ Error al enviar datos a n8n. Código de estado: {response.status_code}")
-            st.code(response.text)
-            return False
-
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Error de conexión al Webhook: {e}. ¿Está n8n escuchando y la URL es correcta?")
-        return False
+    """Envía los datos (metadatos o sesión completa) al Webhook de n8n. Retorna True si n8n respondió 2xx."""
+    # Un cuerpo vacío ({} o []) también es éxito: solo None indica error
+    return core.send_to_n8n("N8N_WEBHOOK_URL", core.N8N_WEBHOOK_URL, data) is not None
 
+@profiler.timed("prompt")
 def build_system_prompt():
     """Crea el System Prompt inyectando el rol y área del usuario para contextualizar la IA."""
-    metadata = st.session_state['user_metadata']
-    rol = metadata.get('rol_jerarquico', 'Usuario')
-    area = metadata.get('area_proceso', 'General')
-    
-    # Asume que stronger_prompt es el prompt base
-    base_prompt = stronger_prompt
+    metadata = st.session_state['chat_metadata']
+    return assemble_system_prompt(PROMPT_VERSION, metadata.get('rol_jerarquico', 'Usuario'), metadata.get('area_proceso', 'General'))
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def assemble_system_prompt(prompt_version, rol, area):
+    """El prompt ensamblado solo depende de la versión del prompt base, el rol y el área (caché en memoria del proceso)."""
+    base_prompt = BASE_PROMPT
     
     context_instruction = (
         f"CONTEXTO DE USUARIO: El usuario con el que estás interactuando es un {rol} "
@@ -66,138 +57,312 @@ def build_system_prompt():
     
     return f"{base_prompt}\n\n{context_instruction}"
 
+def get_session_id():
+    """ID de sesión estable (el mismo que se envía a n8n al finalizar)."""
+    metadata = st.session_state['chat_metadata']
+    return metadata['nombre_id'] + "_" + metadata['timestamp_inicio']
+
+def get_snapshot_id():
+    """ID opaco de la instantánea compartida (va en ?sid=; no revela ni permite adivinar al usuario)."""
+    if 'chat_sid' not in st.session_state:
+        st.session_state['chat_sid'] = secrets.token_urlsafe(16)
+    return st.session_state['chat_sid']
+
+def save_session_snapshot():
+    """Guarda la sesión en la caché compartida para que cualquier proceso pueda retomarla."""
+    snapshot_id = get_snapshot_id()
+    shared_cache.set("sessions", f"chat:{snapshot_id}", {
+        "user_metadata": st.session_state['chat_metadata'],
+        "messages": st.session_state.get('chat_messages', []),
+    })
+    st.query_params["sid"] = snapshot_id
+
+def restore_session_snapshot():
+    """Si la URL trae ?sid= y este proceso no conoce la sesión, la recupera de la caché compartida."""
+    snapshot_id = st.query_params.get("sid")
+    if not snapshot_id or st.session_state.get('chat_started'):
+        return
+
+    snapshot = shared_cache.get("sessions", f"chat:{snapshot_id}")
+    if snapshot:
+        st.session_state['chat_sid'] = snapshot_id
+        st.session_state['chat_metadata'] = snapshot['user_metadata']
+        st.session_state['chat_messages'] = snapshot['messages']
+        st.session_state['chat_started'] = True
+
+def measure_stream(stream, metrics):
+    """Envuelve el stream del LLM midiendo el tiempo al primer fragmento y la duración total."""
+    for chunk in stream:
+        # Con include_usage el último fragmento trae el uso real de tokens (sin texto)
+        if getattr(chunk, "usage", None):
+            metrics['usage'] = chunk.usage
+        if 'ttft_ms' not in metrics:
+            metrics['ttft_ms'] = (time.perf_counter() - metrics['start']) * 1000
+        yield chunk
+    metrics['stream_ms'] = (time.perf_counter() - metrics['start']) * 1000
+
+def record_session_analytics(final_data, start_time, end_time):
+    """Agrega la sesión finalizada al almacén analítico."""
+    metadata = final_data['metadata_inicial']
+    messages = final_data['historial_completo_json']
+    analytics.append("sessions", {
+        "session_id": final_data['session_id'],
+        "app": "main_02",
+        "nombre_id": metadata['nombre_id'],
+        "rol_jerarquico": metadata['rol_jerarquico'],
+        "area_proceso": metadata['area_proceso'],
+        "timestamp_inicio": start_time,
+        "timestamp_fin": end_time,
+        "duracion_seg": (end_time - start_time).total_seconds(),
+        "mensajes": len(messages),
+        "chars_usuario": sum(len(m['content']) for m in messages if m['role'] == 'user'),
+        "chars_asistente": sum(len(m['content']) for m in messages if m['role'] == 'assistant'),
+    })
+
+def archive_transcript(final_data, start_time):
+    """Agrega la conversación completa al archivo local de transcripciones."""
+    metadata = final_data['metadata_inicial']
+    transcripts.append({
+        "session_id": final_data['session_id'],
+        "app": "main_02",
+        "nombre_id": metadata['nombre_id'],
+        "rol_jerarquico": metadata['rol_jerarquico'],
+        "area_proceso": metadata['area_proceso'],
+        "timestamp_inicio": start_time.isoformat(),
+        "timestamp_fin": final_data['timestamp_fin'],
+        "mensajes": final_data['historial_completo_json'],
+    })
+
+@profiler.timed("callback")
+@core.fragment_callback
 def finalize_session():
     """
     Recopila todos los datos de la sesión (metadatos + historial) 
     y los envía a n8n para el análisis final.
     """
-    if 'messages' in st.session_state and 'user_metadata' in st.session_state:
+    if 'chat_messages' in st.session_state and 'chat_metadata' in st.session_state:
+        session_trace.record("main_02.py", "finish")
         
         # 1. Calcular duración de la sesión
-        start_time_str = st.session_state['user_metadata']['timestamp_inicio']
+        start_time_str = st.session_state['chat_metadata']['timestamp_inicio']
         start_time = datetime.datetime.fromisoformat(start_time_str)
         end_time = datetime.datetime.now()
         duration = str(end_time - start_time)
 
         # 2. Formatear historial para envío
         formatted_history = []
-        for msg in st.session_state.messages:
+        for msg in st.session_state.chat_messages:
             formatted_history.append(f"{msg['role'].upper()}: {msg['content']}")
         
         # 3. Ensamblar el paquete de datos final
         final_data = {
-            "session_id": st.session_state['user_metadata']['nombre_id'] + "_" + start_time_str,
-            "metadata_inicial": st.session_state['user_metadata'],
+            "session_id": get_session_id(),
+            "metadata_inicial": st.session_state['chat_metadata'],
             "timestamp_fin": end_time.isoformat(),
             "duracion_sesion": duration,
             "historial_completo_texto": "\n---\n".join(formatted_history),
-            "historial_completo_json": st.session_state.messages,
+            "historial_completo_json": st.session_state.chat_messages,
             "tipo_evento": "FIN_SESION" # Para n8n
         }
         
-        # 4. Enviar a n8n (reutilizamos la misma función)
+        # 4. Copia local para auditoría, antes de depender de n8n
+        archive_transcript(final_data, start_time)
+
+        # 5. Enviar a n8n (reutilizamos la misma función)
         if send_to_n8n(final_data):
-            st.success("✅ Sesión finalizada y datos enviados a n8n para registro.")
+            core.notify("success", "✅ Sesión finalizada y datos enviados a n8n para registro.")
+            record_session_analytics(final_data, start_time, end_time)
             
-            # Limpiar el estado y forzar el regreso al formulario de metadatos
-            for key in ['metadata_submitted', 'messages', 'user_metadata']:
+            # Limpiar el estado (también la instantánea compartida) y volver al formulario
+            shared_cache.delete("sessions", f"chat:{get_snapshot_id()}")
+            st.query_params.clear()
+            for key in ['chat_started', 'chat_sid', 'chat_messages', 'chat_messages_rendered', 'chat_metadata']:
                 if key in st.session_state:
                     del st.session_state[key]
+            session_trace.reset()
             
-            st.rerun()
+            # El botón vive en el fragmento lateral: volver al formulario requiere un rerun de la app completa
+            st.rerun(scope="app")
         else:
-            st.error("❌ Ocurrió un error al intentar enviar los datos finales de la sesión a n8n.")
+            core.notify("error", "❌ Ocurrió un error al intentar enviar los datos finales de la sesión a n8n.")
     else:
-        st.warning("La sesión no se ha inicializado correctamente o faltan datos.")
+        core.notify("warning", "La sesión no se ha inicializado correctamente o faltan datos.")
 
 
 def show_metadata_form():
-    """Muestra el formulario inicial de recolección de metadatos."""
-    # Título actualizado a "Tech Ideas"
-    st.title("🚀 Tech Ideas - Consultora de Ideas de Tecnología")
-    st.subheader("Paso 1: Identificate")
-    
-    with st.form(key='metadata_form', clear_on_submit=False):
-        
-        user_id = st.text_input("👤 Nombre / ID", key="form_user_id", help="Su nombre completo o ID único para seguimiento.")
-        
-        # Opciones de rol basadas en tu última entrada
-        role_options = ["Director", "Gerente", "Coordinador", "Analista"]
-        role = st.selectbox("🎯 Rol Jerárquico", options=role_options, key="form_role")
-        
-        # Opciones de área basadas en tu última entrada
-        area_options = ["Finanzas", "IT", "Ventas", "Marketing", "General"]
-        area = st.selectbox("📊 Área de Proceso", options=area_options, key="form_area")
+    """Muestra el formulario inicial y registra el inicio de sesión en n8n."""
+    metadata = core.show_metadata_form('🚀 Comenzar la Sesión')
 
-        submit_button = st.form_submit_button(label='🚀 Comenzar la Sesión')
+    if metadata:
+        session_trace.record("main_02.py", "metadata", nombre_id=metadata['nombre_id'], rol=metadata['rol_jerarquico'], area=metadata['area_proceso'])
 
-    if submit_button:
-        if not user_id:
-            st.warning("⚠️ Por favor, ingrese su Nombre/ID para continuar.")
-        else:
-            # 1. Metadatos iniciales con el tipo de evento
-            metadata = {
-                "nombre_id": user_id,
-                "rol_jerarquico": role,
-                "area_proceso": area,
-                "timestamp_inicio": datetime.datetime.now().isoformat(),
-                "tipo_evento": "INICIO_SESION" # Para que n8n sepa que es el primer evento
-            }
-            
-            # 2. Enviar a n8n. show_metadata_form incluye un st.success en send_to_n8n
-            if send_to_n8n(metadata):
-                st.session_state['user_metadata'] = metadata
-                st.session_state['metadata_submitted'] = True
-                st.rerun()
+        # 1. Metadatos iniciales con el tipo de evento
+        metadata["tipo_evento"] = "INICIO_SESION" # Para que n8n sepa que es el primer evento
+
+        # 2. Enviar a n8n
+        if send_to_n8n(metadata):
+            st.session_state['chat_metadata'] = metadata
+            st.session_state['chat_started'] = True
+            save_session_snapshot()
+            st.rerun()
 
 def show_chat_interface():
     """Muestra la interfaz de chat principal."""
-    metadata = st.session_state['user_metadata']
+    metadata = st.session_state['chat_metadata']
     
     st.title("📊 Tech Ideas")
     st.caption(f"Entregamos ideas de tecnología para mejorar tu empresa. Rol: {metadata['rol_jerarquico']} - Área: {metadata['area_proceso']}")
 
-    # Botón para finalizar la sesión
-    st.sidebar.button("👋 Finalizar Sesión y Enviar Datos", on_click=finalize_session, type="primary")
+    with st.sidebar:
+        show_session_sidebar()
 
-    if "messages" not in st.session_state:
-        st.session_state["messages"] = [{"role": "assistant", "content": "¡Hola! Gracias por tu tiempo, a continuación iniciaremos la entrevista en cuanto me indiques iniciar la entrevista"}]
+    if "chat_messages" not in st.session_state:
+        st.session_state["chat_messages"] = [{"role": "assistant", "content": "¡Hola! Gracias por tu tiempo, a continuación iniciaremos la entrevista en cuanto me indiques iniciar la entrevista"}]
 
-    for msg in st.session_state.messages:
+    # El historial se dibuja solo en los reruns completos; los turnos nuevos los dibuja el fragmento
+    for msg in st.session_state.chat_messages:
         st.chat_message(msg["role"]).write(msg["content"])
+    st.session_state['chat_messages_rendered'] = len(st.session_state.chat_messages)
 
-    if prompt := st.chat_input(placeholder="Escribe tu respuesta aquí..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.chat_message("user").write(prompt)
-        
-        # Obtiene el prompt contextualizado
-        system_prompt = build_system_prompt()
-        
-        # Construye la conversación: System Prompt + Historial
-        conversation = [{"role": "system", "content": system_prompt}] 
-        conversation.extend({"role": m["role"], "content":m["content"]} for m in st.session_state.messages)
+    show_chat_panel()
+
+
+@st.fragment
+@profiler.fragment("main_02", "session_sidebar")
+def show_session_sidebar():
+    """Botón de cierre de sesión. Es un fragmento: un envío fallido no re-ejecuta el chat."""
+    core.show_notices()
+    st.button("👋 Finalizar Sesión y Enviar Datos", on_click=finalize_session, type="primary")
+
+
+def answer_prompt(prompt, metadata):
+    """Genera (o recupera de la caché) la respuesta del asistente respetando el presupuesto de tokens."""
+    # Obtiene el prompt contextualizado
+    system_prompt = build_system_prompt()
+    
+    # Construye la conversación: System Prompt + Historial
+    system_message = {"role": "system", "content": system_prompt}
+    history = [{"role": m["role"], "content":m["content"]} for m in st.session_state.chat_messages]
+    conversation = [system_message] + history
+
+    # Respuestas idénticas ya generadas por cualquier proceso se sirven desde la caché
+    response_key = cache_key(model_openai, conversation)
+    cached_response = shared_cache.get("llm", response_key)
+
+    # Presupuesto de tokens: las respuestas desde caché no consumen
+    plan = None
+    if not cached_response:
+        plan = budget.plan(metadata, system_message, history)
+        if plan["status"] == "rejected":
+            retry = "más tarde" if plan["wait_s"] == float("inf") else f"en {plan['wait_s']:.0f} s"
+            st.warning(f"⏳ Se alcanzó el presupuesto de tokens por minuto ({plan['limited_by']}). Intente de nuevo {retry}.")
+            st.session_state.chat_messages.pop()
+            return
+        conversation = plan["conversation"]
+
+    # La reserva se devuelve si el turno no llega a liquidarse: error del proveedor o
+    # un rerun/stop de Streamlit (RerunException y StopException no son Exception)
+    settled = False
+    try:
+        if plan and plan["wait_s"] > 0:
+            wait_for_budget(plan["wait_s"])
+        if plan and plan["dropped"]:
+            st.caption(f"ℹ️ Alta demanda: se enviaron solo los últimos {len(plan['conversation']) - 1} mensajes del historial.")
+
+        stream_metrics = {"start": time.perf_counter()}
+        usage = (None, None)
 
         with st.chat_message("assistant"):
             try:
-                stream = client_openai.chat.completions.create(
-                    model=model_openai, 
-                    messages=conversation, 
-                    stream=True
-                )
-                response = st.write_stream(stream)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                if cached_response:
+                    st.write(cached_response)
+                    response = cached_response
+                else:
+                    with profiler.phase("llm"):
+                        stream = client_openai.chat.completions.create(
+                            model=model_openai, 
+                            messages=conversation, 
+                            stream=True,
+                            stream_options={"include_usage": True},
+                        )
+                        response = st.write_stream(measure_stream(stream, stream_metrics))
+                    usage = budget.settle(plan, stream_metrics.get('usage'), response)
+                    settled = True
+                    # Clave de la conversación realmente enviada (puede venir recortada)
+                    shared_cache.set("llm", cache_key(model_openai, conversation), response)
+                st.session_state.chat_messages.append({"role": "assistant", "content": response})
+                save_session_snapshot()
+
+                analytics.append("turns", {
+                    "session_id": get_session_id(),
+                    "app": "main_02",
+                    "rol_jerarquico": metadata['rol_jerarquico'],
+                    "area_proceso": metadata['area_proceso'],
+                    "timestamp": datetime.datetime.now(),
+                    "chars_prompt": len(prompt),
+                    "chars_respuesta": len(response),
+                    "ttft_ms": stream_metrics.get('ttft_ms'),
+                    "stream_ms": stream_metrics.get('stream_ms'),
+                    "desde_cache": bool(cached_response),
+                    "prompt_tokens": usage[0],
+                    "completion_tokens": usage[1],
+                })
             except Exception as e:
                 st.error(f"Error en la llamada a la API de OpenAI: {e}")
                 # Eliminar el último mensaje del usuario para evitar un estado huérfano
-                st.session_state.messages.pop() 
+                st.session_state.chat_messages.pop()
+    finally:
+        if plan and not settled:
+            budget.cancel(plan)
+
+def wait_for_budget(wait_s):
+    """Espera la recarga del presupuesto mostrando la cuenta regresiva (cada actualización permite cortar con un rerun)."""
+    deadline = time.monotonic() + wait_s
+    with st.status("⏳ Alta demanda: esperando presupuesto de tokens...") as status:
+        while (remaining := deadline - time.monotonic()) > 0:
+            status.update(label=f"⏳ Alta demanda: la respuesta comienza en {math.ceil(remaining)} s (presupuesto de tokens por minuto).")
+            time.sleep(min(1.0, remaining))
+        status.update(label="✅ Presupuesto de tokens disponible.", state="complete")
+
+
+@st.fragment
+@profiler.fragment("main_02", "chat_panel")
+def show_chat_panel():
+    """
+    Entrada de chat y turnos enviados desde el último rerun completo. Es un
+    fragmento: cada mensaje re-ejecuta solo este panel, no el historial completo.
+    """
+    metadata = st.session_state['chat_metadata']
+
+    for msg in st.session_state.chat_messages[st.session_state.get('chat_messages_rendered', 0):]:
+        st.chat_message(msg["role"]).write(msg["content"])
+
+    if prompt := st.chat_input(placeholder="Escribe tu respuesta aquí..."):
+        session_trace.record("main_02.py", "chat", text=prompt)
+        st.session_state.chat_messages.append({"role": "user", "content": prompt})
+        st.chat_message("user").write(prompt)
+        
+        answer_prompt(prompt, metadata)
+
+    # Presupuesto en vivo de las cubetas de este usuario
+    st.caption("🪙 Tokens disponibles por minuto: " + " · ".join(
+        f"{row['cubeta']} {row['disponible']:,}/{row['limite_tpm']:,}" for row in budget.snapshot(metadata)
+    ))
 
 
 # --- 3. LÓGICA PRINCIPAL DE LA APLICACIÓN ---
 
-if 'metadata_submitted' not in st.session_state:
-    st.session_state['metadata_submitted'] = False
+with profiler.rerun("main_02"):
+    if 'chat_started' not in st.session_state:
+        st.session_state['chat_started'] = False
+
+    restore_session_snapshot()
+    core.show_notices()
+
+    with profiler.phase("render"):
+        if st.session_state['chat_started']:
+            show_chat_interface()
+        else:
+            show_metadata_form()
 
-if st.session_state['metadata_submitted']:
-    show_chat_interface()
-else:
-    show_metadata_form()
\ No newline at end of file
+    profiler.sidebar_panel()
\ No newline at end of file
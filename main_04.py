@@ -1,26 +1,25 @@
-import os
+import secrets
 import streamlit as st
-import requests
 import datetime
-import json
-from dotenv import load_dotenv
-from openai import OpenAI 
+from question_bank import QuestionBank, QuestionPager
+from shared_cache import get_cache
+import profiler
+import session_trace
+from analytics_store import get_store
+from transcript_archive import get_archive
+import core
+from core import send_to_n8n, N8N_URL_FETCH_Q, N8N_URL_SAVE_A
 
 # --- 1. CONFIGURACIÓN E INICIALIZACIÓN ---
 
-load_dotenv(override=True)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# URLs de n8n, clientes y pool de conexiones vienen del núcleo compartido (uno por proceso)
 
-# Webhooks de n8n - CRÍTICO: Necesitas estas dos URLs en tu .env
-N8N_URL_FETCH_Q = os.getenv("N8N_URL_FETCH_Q") # Para obtener preguntas
-N8N_URL_SAVE_A = os.getenv("N8N_URL_SAVE_A")   # Para guardar respuestas
-
-# ID de usuario por defecto para pruebas
-DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "TEST_USER_A")
-
-# Inicialización de clientes 
-client_openai = OpenAI(api_key=OPENAI_API_KEY)
-model_openai = "gpt-5-mini"
+# Caché compartida entre procesos (SQLite local o Redis según SHARED_CACHE_URL)
+shared_cache = get_cache()
+# Almacén analítico local (Parquet particionado por fecha y área)
+analytics = get_store()
+# Archivo local de transcripciones finalizadas (auditoría, independiente de n8n)
+transcripts = get_archive()
 
 # Lista de Fallback (3 preguntas) - USADA si n8n falla o devuelve 1 pregunta.
 FALLBACK_QUESTIONS = [
@@ -29,121 +28,116 @@ FALLBACK_QUESTIONS = [
     {"ID_Pregunta": "FB03", "Texto_Pregunta": "¿Qué métricas considera esenciales para medir el éxito de la transformación digital?"}
 ]
 
-# --- 2. FUNCIONES DE COMUNICACIÓN Y NORMALIZACIÓN (N8N) ---
+# Largo mínimo de una respuesta válida (se valida localmente antes de enviar)
+MIN_ANSWER_CHARS = 5
 
-def send_to_n8n(url_variable_name, url, data):
-    """Función unificada para enviar datos a n8n, incluyendo verificación de URL y manejo de errores."""
-    
-    response_data = None
-    
-    # === PUNTO DE DIAGNÓSTICO DE CONEXIÓN CRÍTICO ===
-    print(f"\n--- DEBUG: INTENTANDO CONECTAR A {url_variable_name} ---")
-    print(f"URL cargada: {url}")
-    print("---------------------------------------------------\n")
-    
-    # 1. VERIFICACIÓN DE URL: Estricto control de URLs placeholder.
-    if not url or "<Webhook URL" in url:
-        error_message = f"La URL para la variable `{url_variable_name}` es inválida o aún contiene el placeholder."
-        st.error(f"❌ CONFIGURACIÓN CRÍTICA FALLIDA: {error_message}")
-        st.caption("Verifica el archivo `.env`. Asegúrate de que las URLs de n8n estén **CORRECTAS y en modo Production**.")
-        return None
-
-    try:
-        response = requests.post(url, json=data, timeout=10) 
-
-        if response.status_code >= 200 and response.status_code < 300:
-            if response.content:
-                try:
-                    response_data = response.json()
-                except json.JSONDecodeError:
-                    response_data = {"status": "success"} 
-            else:
-                response_data = {"status": "success"}
+# Modos de la entrevista
+MODE_STEP = "Paso a paso"
+MODE_BULK = "Todas en un formulario"
+
+# --- 2. FUNCIONES DE COMUNICACIÓN CON N8N Y BANCO DE PREGUNTAS ---
+
+@st.cache_resource
+def get_question_bank():
+    """Banco de preguntas local compartido por todas las sesiones del proceso."""
+    bank = QuestionBank(core.QUESTION_BANK_PATH, N8N_URL_FETCH_Q, sync_interval=core.QUESTION_BANK_SYNC_SECONDS)
+    bank.start_background_sync()
+    return bank
 
-        else:
-            # Muestra el error de n8n (HTTP 4xx/5xx)
-            st.error(f"❌ Error de n8n en `{url_variable_name}`. Código: {response.status_code}. Mensaje: {response.text[:200]}...")
-            
-    except requests.exceptions.RequestException as e:
-        # Muestra el error de conexión (sin servicio, timeout, etc.)
-        st.error(f"❌ Error de conexión al Webhook `{url_variable_name}`: {e}. Asegúrate de que el servidor de n8n esté activo y la URL sea accesible.")
-    
-    return response_data
 
-def normalize_question_keys(question_data):
+@st.cache_data(max_entries=256, show_spinner=False)
+def questions_for(version, synced_at, rol, area):
     """
-    Normaliza las claves de las preguntas de snake_case (n8n) a PascalCase (app).
+    Lista por Rol/Área en memoria del proceso. La clave incluye synced_at, que
+    cambia en cada sincronización aplicada aunque n8n no envíe versión.
     """
-    key_mapping = {
-        'id_pregunta': 'ID_Pregunta',
-        'pregunta_texto': 'Texto_Pregunta',
-    }
-    
-    normalized = {}
-    for old_key, new_key in key_mapping.items():
-        if old_key in question_data:
-            normalized[new_key] = question_data[old_key]
-        elif new_key in question_data: 
-            normalized[new_key] = question_data[new_key]
-        else:
-            normalized[new_key] = 'N/A' 
-            
-    return {**question_data, **normalized}
+    return get_question_bank().get(rol, area)
 
 
+@profiler.timed("questions")
 def fetch_questions(metadata):
-    """Llama al Flujo 1 de n8n para obtener la lista de preguntas filtradas."""
-    st.info("Buscando preguntas adaptadas a su Rol y Área...")
-    
-    questions_response = send_to_n8n("N8N_URL_FETCH_Q", N8N_URL_FETCH_Q, metadata)
-    
+    """Obtiene las preguntas filtradas por Rol y Área desde el banco local (espejo de n8n)."""
+    bank = get_question_bank()
+    st.session_state.pop('question_pager', None)
+
+    # Primer arranque sin banco en disco: el banco se descarga en segundo plano
+    # y mientras tanto la entrevista arranca con la primera página de n8n
+    if bank.is_empty():
+        return fetch_first_page(metadata)
+
+    questions_list = questions_for(bank.version, bank.synced_at, metadata.get('rol_jerarquico'), metadata.get('area_proceso'))
+
     # ================================================
-    # === DIAGNÓSTICO 1: JSON recibido sin procesar (se imprime en la terminal) ===
-    print("\n--- DIAGNÓSTICO 1: JSON RECIBIDO DE N8N (Raw) ---")
-    print(questions_response) 
+    # === DIAGNÓSTICO: Lista servida desde el banco local (se imprime en la terminal) ===
+    print(f"\n--- DIAGNÓSTICO: BANCO LOCAL versión {bank.version} (sync: {bank.synced_at}) ---")
+    print(questions_list)
+    if bank.last_error:
+        print(f"Último error de sincronización: {bank.last_error}")
     print("----------------------------------------------------------\n")
     # ====================================================================
-    
-    final_list = None
-
-    if questions_response:
-        # Lógica de extracción de la lista de preguntas
-        if isinstance(questions_response, list) and questions_response and isinstance(questions_response[0], dict):
-            final_list = questions_response
-        elif isinstance(questions_response, dict):
-            if 'questions' in questions_response and isinstance(questions_response['questions'], list):
-                final_list = questions_response['questions']
-            elif 'id_pregunta' in questions_response or 'ID_Pregunta' in questions_response:
-                final_list = [questions_response] 
-
-    if final_list:
-        normalized_list = [normalize_question_keys(q) for q in final_list]
-        
-        # ====================================================================
-        # === DIAGNÓSTICO 2: Lista después de la normalización (se imprime en la terminal) ===
-        print("--- DIAGNÓSTICO 2: LISTA NORMALIZADA Y FINAL ---")
-        print(normalized_list)
-        print("------------------------------------------------\n")
-        # ====================================================================
-
-        if normalized_list and all(q.get('ID_Pregunta') != 'N/A' for q in normalized_list):
-            
-            if len(normalized_list) < 2:
-                st.warning("⚠️ n8n devolvió solo 1 pregunta. Usando lista de Fallback para pruebas de navegación.")
-                return FALLBACK_QUESTIONS
-            
-            st.success(f"✅ Se cargaron {len(normalized_list)} preguntas exitosamente.")
-            return normalized_list
-        else:
-            st.error("⚠️ Error de Normalización: Claves faltantes en la respuesta de n8n. Usando Fallback.")
-            return FALLBACK_QUESTIONS
-    
-    st.error("❌ No se pudo obtener la lista de preguntas de n8n. Usando la lista de Fallback (3 preguntas).")
-    return FALLBACK_QUESTIONS 
+
+    if len(questions_list) < 2:
+        st.warning("⚠️ El banco tiene menos de 2 preguntas para este Rol/Área. Usando lista de Fallback para pruebas de navegación.")
+        return FALLBACK_QUESTIONS
+
+    if bank.last_error:
+        st.caption(f"ℹ️ Sin conexión con n8n; usando la versión local {bank.version} del banco de preguntas.")
+
+    st.success(f"✅ Se cargaron {len(questions_list)} preguntas exitosamente.")
+    return questions_list
+
+def fetch_first_page(metadata):
+    """Pide a n8n solo la primera página de preguntas del Rol/Área; el resto se precarga al avanzar."""
+    pager = QuestionPager(N8N_URL_FETCH_Q, metadata.get('rol_jerarquico'), metadata.get('area_proceso'), page_size=core.QUESTION_PAGE_SIZE)
+    pager.fetch_next()
+
+    # ================================================
+    # === DIAGNÓSTICO: Primera página recibida de n8n (se imprime en la terminal) ===
+    print(f"\n--- DIAGNÓSTICO: PÁGINA 1 DE N8N ({len(pager.questions)} preguntas, total: {pager.total}, hay más: {pager.has_more}) ---")
+    print(pager.questions)
+    if pager.last_error:
+        print(f"Error: {pager.last_error}")
+    print("----------------------------------------------------------\n")
+    # ====================================================================
+
+    if not pager.questions:
+        st.error("❌ No se pudo obtener el banco de preguntas de n8n. Usando la lista de Fallback (3 preguntas).")
+        return FALLBACK_QUESTIONS
+
+    if len(pager.questions) < 2 and pager.complete:
+        st.warning("⚠️ El banco tiene menos de 2 preguntas para este Rol/Área. Usando lista de Fallback para pruebas de navegación.")
+        return FALLBACK_QUESTIONS
+
+    st.session_state['question_pager'] = pager
+    st.success(f"✅ Se cargaron las primeras {len(pager.questions)} preguntas; el resto se descarga mientras responde.")
+    return pager.questions
+
+def has_more_questions():
+    """True si n8n todavía tiene páginas de preguntas sin descargar para esta sesión."""
+    pager = st.session_state.get('question_pager')
+    return bool(pager and pager.has_more)
+
+def questions_progress():
+    """(preguntas cargadas, hay más páginas), leídos de forma consistente con la precarga en curso."""
+    pager = st.session_state.get('question_pager')
+    if pager:
+        return pager.progress()
+    return len(st.session_state.questions_list), False
 
 def save_answer(question_id, answer_text):
     """Llama al Flujo 2 de n8n para guardar una respuesta individual."""
-    metadata = st.session_state.get('user_metadata', {})
+    timestamp = send_answer(question_id, answer_text)
+    if timestamp:
+        core.notify("toast", f"✅ Respuesta de {question_id} guardada.", icon="💾")
+        record_answer_saved(question_id, answer_text, timestamp)
+        return True
+
+    core.notify("warning", "⚠️ Error al guardar la respuesta. La aplicación NO avanzará. Revise su consola y el historial de ejecución de n8n.")
+    return False
+
+def send_answer(question_id, answer_text):
+    """Envía una respuesta individual al Flujo 2. Retorna su timestamp si n8n la recibió, o None."""
+    metadata = st.session_state.get('interview_metadata', {})
     
     answer_data = {
         "nombre_id": metadata.get('nombre_id', 'N/A'),
@@ -154,23 +148,144 @@ def save_answer(question_id, answer_text):
         "timestamp_respuesta": datetime.datetime.now().isoformat()
     }
     
-    # Guarda la respuesta. Retorna True solo si send_to_n8n no devuelve None.
-    if send_to_n8n("N8N_URL_SAVE_A", N8N_URL_SAVE_A, answer_data):
-        st.toast(f"✅ Respuesta de {question_id} guardada.", icon="💾")
-        return True
-    
-    st.warning("⚠️ Error al guardar la respuesta. La aplicación NO avanzará. Revise su consola y el historial de ejecución de n8n.")
-    return False
+    # Guarda la respuesta. Solo cuenta como recibida si send_to_n8n no devuelve None.
+    if send_to_n8n("N8N_URL_SAVE_A", N8N_URL_SAVE_A, answer_data) is not None:
+        return answer_data['timestamp_respuesta']
+    return None
+
+def save_answers_batch(answers):
+    """
+    Guarda varias respuestas en una sola llamada al Flujo 2 de n8n
+    (tipo_evento LOTE_RESPUESTAS). `answers` es una lista de (id_pregunta, texto).
+
+    n8n responde con el estado de cada respuesta:
+        {"resultados": [{"id_pregunta": "Q01", "status": "ok"},
+                        {"id_pregunta": "Q02", "status": "error", "mensaje": "..."}]}
+    Si la respuesta no trae "resultados" (p. ej. la respuesta por defecto del
+    webhook, {"message": "Workflow was started"}), el lote no está confirmado:
+    ninguna respuesta se da por guardada y no se reenvían (el flujo pudo haberlas
+    guardado ya).
+
+    Retorna {id_pregunta: (guardada, mensaje)}.
+    """
+    metadata = st.session_state.get('interview_metadata', {})
+    timestamp = datetime.datetime.now().isoformat()
+
+    batch_data = {
+        "tipo_evento": "LOTE_RESPUESTAS",
+        "nombre_id": metadata.get('nombre_id', 'N/A'),
+        "rol_jerarquico": metadata.get('rol_jerarquico', 'N/A'),
+        "area_proceso": metadata.get('area_proceso', 'N/A'),
+        "respuestas": [
+            {"id_pregunta": question_id, "respuesta_texto": answer_text, "timestamp_respuesta": timestamp}
+            for question_id, answer_text in answers
+        ],
+    }
+
+    response = send_to_n8n("N8N_URL_SAVE_A", N8N_URL_SAVE_A, batch_data)
+    if response is None:
+        return {question_id: (False, "n8n no recibió el lote.") for question_id, _ in answers}
+
+    results = response if isinstance(response, list) else response.get("resultados")
+    if results is None:
+        print("--- LOTE_RESPUESTAS sin 'resultados': n8n no confirmó el lote. ---")
+        return {question_id: (False, "n8n no confirmó el lote.") for question_id, _ in answers}
+
+    # Los IDs pueden llegar como número o texto: se comparan siempre como texto
+    by_id = {str(r.get("id_pregunta")): r for r in results if isinstance(r, dict)}
+    statuses = {}
+    for question_id, _ in answers:
+        result = by_id.get(str(question_id), {})
+        saved = str(result.get("status", "")).lower() in ("ok", "success", "guardada")
+        statuses[question_id] = (saved, result.get("mensaje") or ("" if saved else "n8n no confirmó esta respuesta."))
+
+    for question_id, answer_text in answers:
+        if statuses[question_id][0]:
+            record_answer_saved(question_id, answer_text, timestamp)
+    return statuses
+
+def record_answer_saved(question_id, answer_text, timestamp):
+    """Actualiza los contadores de la sesión y agrega la respuesta al almacén analítico."""
+    metadata = st.session_state.get('interview_metadata', {})
+    st.session_state['answers_saved'] = st.session_state.get('answers_saved', 0) + 1
+    st.session_state['answers_chars'] = st.session_state.get('answers_chars', 0) + len(answer_text)
+    st.session_state.setdefault('answers_log', []).append(
+        {"id_pregunta": question_id, "respuesta_texto": answer_text, "timestamp_respuesta": timestamp}
+    )
+
+    if metadata:
+        analytics.append("answers", {
+            "session_id": get_session_id(),
+            "app": "main_04",
+            "nombre_id": metadata['nombre_id'],
+            "rol_jerarquico": metadata['rol_jerarquico'],
+            "area_proceso": metadata['area_proceso'],
+            "id_pregunta": str(question_id),
+            "timestamp": timestamp,
+            "chars_respuesta": len(answer_text),
+            "palabras_respuesta": len(answer_text.split()),
+        })
+
+def is_valid_answer(answer_text):
+    return bool(answer_text) and len(answer_text.strip()) >= MIN_ANSWER_CHARS
+
+def get_session_id():
+    """ID de sesión estable a partir de los metadatos del usuario."""
+    metadata = st.session_state['interview_metadata']
+    return metadata['nombre_id'] + "_" + metadata['timestamp_inicio']
+
+def get_snapshot_id():
+    """ID opaco de la instantánea compartida (va en ?sid=; no revela ni permite adivinar al usuario)."""
+    if 'interview_sid' not in st.session_state:
+        st.session_state['interview_sid'] = secrets.token_urlsafe(16)
+    return st.session_state['interview_sid']
+
+def save_session_snapshot():
+    """Guarda el avance de la entrevista en la caché compartida para que cualquier proceso pueda retomarla."""
+    snapshot_id = get_snapshot_id()
+    # Estado del paginador antes que la lista: si una página llega entre ambas
+    # lecturas, al retomar se vuelve a pedir y las repetidas se descartan
+    pager_state = st.session_state['question_pager'].state() if has_more_questions() else None
+    shared_cache.set("sessions", f"entrevista:{snapshot_id}", {
+        "interview_metadata": st.session_state['interview_metadata'],
+        "questions_list": list(st.session_state['questions_list']),
+        "current_question_index": st.session_state.get('current_question_index', 0),
+        "bulk_saved": st.session_state.get('bulk_saved', []),
+        "answers_log": st.session_state.get('answers_log', []),
+        "question_pager": pager_state,
+    })
+    st.query_params["sid"] = snapshot_id
+
+def restore_session_snapshot():
+    """Si la URL trae ?sid= y este proceso no conoce la sesión, la recupera de la caché compartida."""
+    snapshot_id = st.query_params.get("sid")
+    if not snapshot_id or st.session_state.get('interview_started'):
+        return
+
+    snapshot = shared_cache.get("sessions", f"entrevista:{snapshot_id}")
+    if snapshot:
+        st.session_state['interview_sid'] = snapshot_id
+        st.session_state['interview_metadata'] = snapshot['interview_metadata']
+        st.session_state['questions_list'] = snapshot['questions_list']
+        st.session_state['current_question_index'] = snapshot['current_question_index']
+        st.session_state['bulk_saved'] = snapshot.get('bulk_saved', [])
+        st.session_state['answers_log'] = snapshot.get('answers_log', [])
+        if snapshot.get('question_pager'):
+            st.session_state['question_pager'] = QuestionPager.resume(N8N_URL_FETCH_Q, snapshot['question_pager'], st.session_state['questions_list'])
+        st.session_state['interview_started'] = True
 
 # --- 3. FUNCIONES DE INTERFAZ DE USUARIO ---
 
+@profiler.timed("callback")
+@core.fragment_callback
 def handle_next_question(answer_key):
     """Maneja el click del botón: Guarda la respuesta y avanza al siguiente índice."""
     
     user_answer = st.session_state.get(answer_key, "")
+    session_trace.record("main_04.py", "answer", text=user_answer)
     
-    if not user_answer or len(user_answer.strip()) < 5:
-        st.warning("Debe proporcionar una respuesta significativa (mínimo 5 caracteres) para continuar.")
+    if not is_valid_answer(user_answer):
+        core.notify("warning", f"Debe proporcionar una respuesta significativa (mínimo {MIN_ANSWER_CHARS} caracteres) para continuar.")
         return 
         
     current_index = st.session_state['current_question_index']
@@ -181,43 +296,187 @@ def handle_next_question(answer_key):
     if question_id_to_save and save_answer(question_id_to_save, user_answer):
         
         # 2. AVANZAR AL SIGUIENTE ÍNDICE O FINALIZAR
-        if (current_index + 1) < len(st.session_state.questions_list):
+        # Al volver del callback solo se re-ejecuta el fragmento de la pregunta (sin st.rerun extra)
+        loaded, more = questions_progress()
+        if (current_index + 1) < loaded or more:
             st.session_state['current_question_index'] += 1
             st.session_state[answer_key] = "" 
-            st.rerun()
+            save_session_snapshot()
         else:
             finalize_interview() 
 
 def finalize_interview():
     """Finaliza el proceso y limpia el estado de la sesión."""
-    st.success("✅ ¡Entrevista completada! Gracias por su participación.")
+    core.notify("success", "✅ ¡Entrevista completada! Gracias por su participación.")
     
+    if 'interview_metadata' in st.session_state:
+        metadata = st.session_state['interview_metadata']
+        start_time = datetime.datetime.fromisoformat(metadata['timestamp_inicio'])
+        end_time = datetime.datetime.now()
+        analytics.append("sessions", {
+            "session_id": get_session_id(),
+            "app": "main_04",
+            "nombre_id": metadata['nombre_id'],
+            "rol_jerarquico": metadata['rol_jerarquico'],
+            "area_proceso": metadata['area_proceso'],
+            "timestamp_inicio": start_time,
+            "timestamp_fin": end_time,
+            "duracion_seg": (end_time - start_time).total_seconds(),
+            "mensajes": st.session_state.get('answers_saved', 0),
+            "chars_usuario": st.session_state.get('answers_chars', 0),
+        })
+        transcripts.append({
+            "session_id": get_session_id(),
+            "app": "main_04",
+            "nombre_id": metadata['nombre_id'],
+            "rol_jerarquico": metadata['rol_jerarquico'],
+            "area_proceso": metadata['area_proceso'],
+            "timestamp_inicio": metadata['timestamp_inicio'],
+            "timestamp_fin": end_time.isoformat(),
+            "respuestas": st.session_state.get('answers_log', []),
+        })
+
+        # Limpiar también la instantánea compartida
+        shared_cache.delete("sessions", f"entrevista:{get_snapshot_id()}")
+
     # Limpiar estado y volver al formulario inicial
-    for key in ['metadata_submitted', 'user_metadata', 'questions_list', 'current_question_index', 'current_answer_input']:
+    st.query_params.clear()
+    for key in ['interview_started', 'interview_sid', 'interview_metadata', 'questions_list', 'current_question_index', 'current_answer_input', 'answers_saved', 'answers_chars', 'interview_mode', 'bulk_saved', 'bulk_status', 'question_pager', 'answers_log']:
         if key in st.session_state:
             del st.session_state[key]
+    session_trace.reset()
     
-    st.rerun()
+    # Se sale del fragmento de la pregunta: hace falta un rerun de la app completa
+    st.rerun(scope="app")
+
+@core.fragment_callback
+def abandon_interview():
+    """Sale de la entrevista sin guardar la respuesta actual."""
+    session_trace.record("main_04.py", "abandon")
+    finalize_interview()
 
 def show_interview_interface():
-    """Muestra la interfaz de entrevista paso a paso."""
-    
+    """Muestra la interfaz de entrevista: paso a paso o todas las preguntas en un formulario."""
+
     if 'current_question_index' not in st.session_state:
         st.session_state['current_question_index'] = 0
-        
+
+    st.title("💡 Entrevista de Innovación Tecnológica")
+    mode = st.radio(
+        "Modo de entrevista",
+        options=[MODE_STEP, MODE_BULK],
+        key="interview_mode",
+        horizontal=True,
+        on_change=lambda: session_trace.record("main_04.py", "mode", mode=st.session_state['interview_mode']),
+        help="En el formulario completo las respuestas se validan juntas y se guardan en un solo envío.",
+    )
+
+    if mode == MODE_BULK:
+        show_bulk_form()
+    else:
+        show_question_panel()
+
+
+def pending_bulk_questions():
+    """Preguntas desde el índice actual que aún no se guardaron desde el formulario completo."""
+    # El formulario completo necesita todas las páginas
+    if has_more_questions():
+        st.session_state['question_pager'].load_all()
+    bulk_saved = st.session_state.get('bulk_saved', [])
+    questions = st.session_state.questions_list[st.session_state['current_question_index']:]
+    return [q for q in questions if q.get("ID_Pregunta") not in bulk_saved]
+
+@profiler.timed("callback")
+@core.fragment_callback
+def handle_bulk_submit():
+    """Valida el lote completo localmente y lo guarda con una sola llamada a n8n."""
+    answers = [(q.get("ID_Pregunta"), st.session_state.get(f"bulk_answer_{q.get('ID_Pregunta')}", "")) for q in pending_bulk_questions()]
+    session_trace.record("main_04.py", "bulk", answers=[answer_text for _, answer_text in answers])
+
+    # 1. VALIDAR EL LOTE COMPLETO ANTES DE ENVIAR NADA
+    invalid = [question_id for question_id, answer_text in answers if not is_valid_answer(answer_text)]
+    if invalid:
+        core.notify("warning", f"Debe proporcionar una respuesta significativa (mínimo {MIN_ANSWER_CHARS} caracteres) en: {', '.join(map(str, invalid))}. No se envió ninguna respuesta.")
+        return
+
+    # 2. UN SOLO ENVÍO A N8N CON ESTADO POR RESPUESTA
+    statuses = save_answers_batch(answers)
+    saved_ids = [question_id for question_id, (saved, _) in statuses.items() if saved]
+
+    if len(saved_ids) == len(answers):
+        core.notify("success", f"✅ {len(saved_ids)} respuestas guardadas.")
+        finalize_interview()
+        return
+
+    # 3. ENVÍO PARCIAL: en el formulario quedan solo las que fallaron
+    st.session_state['bulk_saved'] = st.session_state.get('bulk_saved', []) + saved_ids
+    st.session_state['bulk_status'] = statuses
+    save_session_snapshot()
+
+
+@st.fragment
+@profiler.fragment("main_04", "bulk_form")
+def show_bulk_form():
+    """
+    Todas las preguntas pendientes en un solo formulario. Al enviarlo se valida
+    el lote completo y se guarda con un solo envío (ver handle_bulk_submit).
+    """
+    with st.spinner("Cargando el resto de las preguntas..."):
+        pending = pending_bulk_questions()
+    metadata = st.session_state.get('interview_metadata', {'rol_jerarquico': 'N/A', 'area_proceso': 'N/A'})
+
+    core.show_notices()
+    st.caption(f"{len(pending)} preguntas pendientes | Rol: {metadata['rol_jerarquico']} | Área: {metadata['area_proceso']}")
+
+    # Estado por respuesta del último envío parcial
+    for question_id, (saved, message) in st.session_state.get('bulk_status', {}).items():
+        st.markdown(f"{'✅' if saved else '❌'} **{question_id}** {message}")
+
+    with st.form(key="bulk_interview_form", clear_on_submit=False):
+        for q in pending:
+            st.markdown(f"**{q.get('ID_Pregunta', 'N/A')}** — {q.get('Texto_Pregunta', 'Error al cargar el texto de la pregunta.')}")
+            st.text_area("Su Respuesta:", key=f"bulk_answer_{q.get('ID_Pregunta')}", height=100)
+        st.form_submit_button("Guardar Todas las Respuestas 💾", on_click=handle_bulk_submit, type="primary")
+
+
+@st.fragment
+@profiler.fragment("main_04", "question_panel")
+def show_question_panel():
+    """
+    Pregunta actual, respuesta y botones. Es un fragmento: guardar y avanzar
+    re-ejecuta solo este panel, no el script completo.
+    """
     questions = st.session_state.questions_list
     current_index = st.session_state['current_question_index']
-    total_questions = len(questions)
+
+    # Carga paginada: esperar solo si el usuario alcanzó el final de lo descargado
+    pager = st.session_state.get('question_pager')
+    if pager:
+        if current_index >= len(questions) and pager.has_more:
+            with st.spinner("Cargando más preguntas..."):
+                pager.wait_for(current_index)
+        pager.prefetch(current_index)
+    total_questions, more = questions_progress()
+
+    # Saltar las preguntas ya guardadas desde el formulario completo
+    bulk_saved = st.session_state.get('bulk_saved', [])
+    while current_index < total_questions and questions[current_index].get("ID_Pregunta") in bulk_saved:
+        current_index += 1
+    st.session_state['current_question_index'] = current_index
+
+    metadata = st.session_state.get('interview_metadata', {'rol_jerarquico': 'N/A', 'area_proceso': 'N/A'})
     
-    metadata = st.session_state.get('user_metadata', {'rol_jerarquico': 'N/A', 'area_proceso': 'N/A'})
-    
-    st.title("💡 Entrevista de Innovación Tecnológica")
-    st.caption(f"Pregunta {current_index + 1} de {total_questions} | Rol: {metadata['rol_jerarquico']} | Área: {metadata['area_proceso']}")
+    core.show_notices()
+    total_label = (pager.total or f"{total_questions}+") if more else total_questions
+    st.caption(f"Pregunta {current_index + 1} de {total_label} | Rol: {metadata['rol_jerarquico']} | Área: {metadata['area_proceso']}")
     
     if current_index >= total_questions:
         finalize_interview()
         return
 
+    if pager and pager.last_error:
+        st.caption(f"ℹ️ {pager.last_error}. La entrevista continúa con las preguntas ya cargadas.")
+
     current_q_data = questions[current_index]
     
     st.subheader(f"Pregunta: {current_q_data.get('ID_Pregunta', 'N/A')}")
@@ -232,7 +491,7 @@ def show_interview_interface():
         help="Proporcione una respuesta detallada que refleje su perspectiva."
     )
 
-    if current_index < total_questions - 1:
+    if current_index < total_questions - 1 or more:
         st.button(
             "Guardar Respuesta y Siguiente ➡️", 
             on_click=handle_next_question, 
@@ -248,57 +507,44 @@ def show_interview_interface():
         )
         st.button(
             "Terminar sin Guardar Última Respuesta ❌",
-            on_click=finalize_interview,
+            on_click=abandon_interview,
             help="Solo presione si desea salir sin guardar la respuesta actual."
         )
 
 
 def show_metadata_form():
-    """Muestra el formulario inicial de recolección de metadatos."""
-    st.title("🚀 Tech Ideas - Consultora de Ideas de Tecnología")
-    st.subheader("Paso 1: Identificate")
-    
-    with st.form(key='metadata_form', clear_on_submit=False):
-        
-        user_id = st.text_input("👤 Nombre / ID", key="form_user_id", value=DEFAULT_USER_ID, help="Su nombre completo o ID único para seguimiento.")
-        
-        role_options = ["Director", "Gerente", "Coordinador", "Analista"]
-        role = st.selectbox("🎯 Rol Jerárquico", options=role_options, key="form_role")
-        
-        area_options = ["Finanzas", "IT", "Ventas", "Marketing", "General"]
-        area = st.selectbox("📊 Área de Proceso", options=area_options, key="form_area")
+    """Muestra el formulario inicial y carga las preguntas para el Rol y Área elegidos."""
+    metadata = core.show_metadata_form('🚀 Comenzar la Entrevista', default_user_id=core.DEFAULT_USER_ID)
+
+    if metadata:
+        session_trace.record("main_04.py", "metadata", nombre_id=metadata['nombre_id'], rol=metadata['rol_jerarquico'], area=metadata['area_proceso'])
+
+        # 1. OBTENER LAS PREGUNTAS FILTRADAS (banco local, espejo de n8n)
+        questions_list = fetch_questions(metadata)
+
+        if questions_list:
+            # 2. Guardar estado y cambiar de interfaz
+            st.session_state['interview_metadata'] = metadata
+            st.session_state['questions_list'] = questions_list
+            st.session_state['interview_started'] = True
+            st.session_state['current_question_index'] = 0
+            save_session_snapshot()
+            st.rerun()
 
-        submit_button = st.form_submit_button(label='🚀 Comenzar la Entrevista')
 
-    if submit_button:
-        if not user_id:
-            st.warning("⚠️ Por favor, ingrese su Nombre/ID para continuar.")
-        else:
-            metadata = {
-                "nombre_id": user_id,
-                "rol_jerarquico": role,
-                "area_proceso": area,
-                "timestamp_inicio": datetime.datetime.now().isoformat()
-            }
-            
-            # 1. OBTENER LAS PREGUNTAS FILTRADAS DE N8N
-            questions_list = fetch_questions(metadata)
-            
-            if questions_list:
-                # 2. Guardar estado y cambiar de interfaz
-                st.session_state['user_metadata'] = metadata
-                st.session_state['questions_list'] = questions_list
-                st.session_state['metadata_submitted'] = True
-                st.session_state['current_question_index'] = 0
-                st.rerun()
+# --- 4. LÓGICA PRINCIPAL DE LA APLICACIÓN ---
 
+with profiler.rerun("main_04"):
+    if 'interview_started' not in st.session_state:
+        st.session_state['interview_started'] = False
 
-# --- 4. LÓGICA PRINCIPAL DE LA APLICACIÓN ---
+    restore_session_snapshot()
+    core.show_notices()
 
-if 'metadata_submitted' not in st.session_state:
-    st.session_state['metadata_submitted'] = False
+    with profiler.phase("render"):
+        if st.session_state['interview_started']:
+            show_interview_interface()
+        else:
+            show_metadata_form()
 
-if st.session_state['metadata_submitted']:
-    show_interview_interface()
-else:
-    show_metadata_form()
+    profiler.sidebar_panel()
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import cProfile
+import datetime
+import threading
+import functools
+from contextlib import contextmanager
+
+import streamlit as st
+
+# --- PERFILADOR OPCIONAL POR RERUN ---
+#
+# Se activa con la variable de entorno TECH_IDEAS_PROFILE:
+#   TECH_IDEAS_PROFILE=1         -> temporizadores por rerun y por fase
+#   TECH_IDEAS_PROFILE=cprofile  -> además, un .prof de cProfile por cada rerun lento
+#
+# Cada ejecución del script se envuelve con `profiler.rerun(...)` y las fases
+# con nombre (render, prompt, webhook, llm, ...) con `profiler.phase(...)`.
+# Los tiempos de fase son inclusivos (una fase anidada también suma a la externa).
+# Los reruns más lentos se vuelcan a TECH_IDEAS_PROFILE_DIR/slowest_reruns.json.
+# Los fragmentos (st.fragment) se decoran con `profiler.fragment(...)`: cuando se
+# re-ejecutan solos cuentan como un rerun propio ("main_04:question_panel").
+
+SLOWEST_KEPT = 20
+RECENT_KEPT = 50
+
+_local = threading.local()
+_lock = threading.Lock()
+# cProfile (sys.monitoring en 3.12) solo admite un perfilador activo por proceso
+_cprofile_lock = threading.Lock()
+_recent = []
+_slowest = []
+
+
+def mode():
+    return os.getenv("TECH_IDEAS_PROFILE", "").strip().lower()
+
+
+def enabled():
+    return mode() not in ("", "0", "false", "no")
+
+
+def _profile_dir():
+    return os.getenv("TECH_IDEAS_PROFILE_DIR", "profiles")
+
+
+def _new_record(script_name):
+    return {
+        "script": script_name,
+        "started_at": datetime.datetime.now().isoformat(),
+        "total_ms": 0.0,
+        "cpu_ms": 0.0,
+        "callback_ms": 0.0,
+        "phases": {},
+        "phase_calls": {},
+        "outcome": "ok",
+        "profile_path": None,
+    }
+
+
+@contextmanager
+def phase(name):
+    """Mide una fase con nombre dentro del rerun actual."""
+    if not enabled():
+        yield
+        return
+
+    record = getattr(_local, "record", None)
+    if record is None:
+        # Los callbacks (on_click) corren en el mismo hilo justo antes del script:
+        # sus fases se guardan aparte y se suman al rerun que viene a continuación.
+        record = getattr(_local, "pending", None)
+        if record is None:
+            record = _local.pending = _new_record(None)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record["phases"][name] = record["phases"].get(name, 0.0) + elapsed_ms
+        record["phase_calls"][name] = record["phase_calls"].get(name, 0) + 1
+
+
+def timed(name):
+    """Decorador equivalente a envolver la función completa con `phase(name)`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def fragment(script_name, name):
+    """
+    Decorador para funciones st.fragment. Dentro de un rerun completo es una
+    fase más; cuando el fragmento se re-ejecuta solo, registra su propio rerun.
+    Se aplica debajo de @st.fragment.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "record", None) is not None:
+                with phase(name):
+                    return func(*args, **kwargs)
+            with rerun(f"{script_name}:{name}"), phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def rerun(script_name):
+    """Envuelve una ejecución completa del script de Streamlit."""
+    if not enabled():
+        yield
+        return
+
+    record = _new_record(script_name)
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        record["phases"].update(pending["phases"])
+        record["phase_calls"].update(pending["phase_calls"])
+        record["callback_ms"] = pending["phases"].get("callback", 0.0)
+        _local.pending = None
+    _local.record = record
+
+    profile = None
+    if mode() == "cprofile" and _cprofile_lock.acquire(blocking=False):
+        profile = cProfile.Profile()
+        profile.enable()
+
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    except BaseException as e:
+        # st.rerun() y st.stop() se implementan con excepciones: se registran y se propagan
+        name = type(e).__name__
+        record["outcome"] = {"RerunException": "st.rerun", "StopException": "st.stop"}.get(name, f"error: {name}")
+        raise
+    finally:
+        # El total incluye el callback que disparó este rerun
+        record["total_ms"] = (time.perf_counter() - start) * 1000 + record["callback_ms"]
+        record["cpu_ms"] = (time.thread_time() - cpu_start) * 1000
+        if profile is not None:
+            profile.disable()
+            _cprofile_lock.release()
+        _local.record = None
+        _store(record, profile)
+
+
+def _store(record, profile):
+    with _lock:
+        _recent.append(record)
+        del _recent[:-RECENT_KEPT]
+
+        if len(_slowest) >= SLOWEST_KEPT and record["total_ms"] <= _slowest[-1]["total_ms"]:
+            return
+
+        os.makedirs(_profile_dir(), exist_ok=True)
+        if profile is not None:
+            stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            record["profile_path"] = os.path.join(_profile_dir(), f"rerun_{record['script']}_{stamp}.prof")
+            profile.dump_stats(record["profile_path"])
+
+        _slowest.append(record)
+        _slowest.sort(key=lambda r: r["total_ms"], reverse=True)
+        for dropped in _slowest[SLOWEST_KEPT:]:
+            if dropped["profile_path"] and os.path.exists(dropped["profile_path"]):
+                os.remove(dropped["profile_path"])
+        del _slowest[SLOWEST_KEPT:]
+
+        dump_slowest()
+
+
+def dump_slowest(path=None):
+    """Escribe los reruns más lentos (con sus fases) a un JSON."""
+    path = path or os.path.join(_profile_dir(), "slowest_reruns.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_slowest, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def sidebar_panel():
+    """Panel lateral con el rerun anterior y los más lentos del proceso."""
+    if not enabled():
+        return
+
+    with _lock:
+        recent = list(_recent[-10:])
+        slowest = list(_slowest[:5])
+
+    with st.sidebar.expander("⏱️ Perfilador de reruns", expanded=False):
+        st.caption(f"Modo: `{mode()}` | reruns registrados en este proceso: {len(_recent)}")
+
+        if recent:
+            last = recent[-1]
+            st.markdown(f"**Último rerun:** `{last['script']}` {last['total_ms']:.1f} ms, CPU {last['cpu_ms']:.1f} ms ({last['outcome']})")
+            for name, ms in sorted(last["phases"].items(), key=lambda item: item[1], reverse=True):
+                st.text(f"{name:<12} {ms:>9.1f} ms  x{last['phase_calls'][name]}")
+
+            # Reruns encadenados (p. ej. st.rerun() dentro de un callback) aparecen consecutivos
+            st.markdown("**Últimos reruns:**")
+            st.text("\n".join(f"{r['started_at'][11:23]}  {r['total_ms']:>8.1f} ms  {r['script']}  {r['outcome']}" for r in reversed(recent)))
+
+        if slowest:
+            st.markdown("**Más lentos:**")
+            st.text("\n".join(f"{r['total_ms']:>8.1f} ms  {r['script']}  {r['outcome']}" for r in slowest))
+            st.caption(f"Detalle en `{os.path.join(_profile_dir(), 'slowest_reruns.json')}`")
@@ -0,0 +1,191 @@
+"""
+Variantes comprimidas del prompt base (prompts.py).
+
+Paso de build:
+    python prompt_variants.py            # genera build/prompt_variants.json
+
+Variantes:
+    full     -> stronger_prompt tal cual.
+    compact  -> sin emojis decorativos, sin énfasis markdown, sin relleno, espacios colapsados.
+    minimal  -> compact + ejemplos recortados (un solo ejemplo de desvío, menos CTAs, sin guía de formato).
+
+En tiempo de ejecución cada app elige su variante con PROMPT_VARIANT_<APP>
+(p. ej. PROMPT_VARIANT_MAIN_02=compact) o, para todas, con PROMPT_VARIANT.
+"""
+import os
+import re
+import json
+import hashlib
+import functools
+
+import prompts
+
+BUILD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build", "prompt_variants.json")
+VARIANTS = ("full", "compact", "minimal")
+DEFAULT_VARIANT = "full"
+
+SECTIONS = [
+    ("role_section", prompts.role_section),
+    ("security_section", prompts.security_section),
+    ("goal_section", prompts.goal_section),
+    ("style_section", prompts.style_section),
+    ("response_template", prompts.response_template),
+    ("onboarding_section", prompts.onboarding_section),
+    ("oo_domain_examples", prompts.oo_domain_examples),
+    ("explanation_best_practices", prompts.explanation_best_practices),
+    ("closing_cta", prompts.closing_cta),
+    ("disclaimer_section", prompts.disclaimer_section),
+    ("end_state", prompts.end_state),
+]
+
+# Emojis y símbolos pictográficos (incluye selectores de variación y ZWJ); las flechas se conservan
+EMOJI_RE = re.compile(
+    "[\U0001F000-\U0001FAFF☀-➿⬀-⯿\uFE0F\u200D]+"
+)
+
+# Relleno que no cambia la instrucción
+REDUNDANT_PHRASES = [
+    (r"\(plantilla\)", ""),
+    (r"\(ejemplos prácticos\)", ""),
+    (r"\(ejemplos\)", ""),
+    (r"\bSiempre ofrece\b", "Ofrece"),
+    (r"\bAsegúrate de\s+", ""),
+    (r"\bmantener el flujo\b", "seguir"),
+    (r"\bque mantenga la conversación en marcha\b", "para continuar"),
+]
+
+
+# --- 1. TRANSFORMACIONES ---
+
+def strip_emoji(text):
+    text = EMOJI_RE.sub("", text)
+    # Sin el emoji quedan huecos tras comillas de apertura
+    return re.sub(r"([“\"(])[ \t]+", r"\1", text)
+
+
+def strip_emphasis(text):
+    """Quita **negritas** y *cursivas* (el modelo no las necesita para entender la instrucción)."""
+    text = re.sub(r"\*\*(.+?)\*\*", r"\1", text)
+    return re.sub(r"(?<!\w)\*(?!\s)(.+?)(?<!\s)\*(?!\w)", r"\1", text)
+
+
+def remove_redundant(text):
+    for pattern, replacement in REDUNDANT_PHRASES:
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def collapse_whitespace(text):
+    """Colapsa espacios internos y líneas vacías; conserva la sangría de las sublistas."""
+    lines = [re.sub(r"(?<=\S)[ \t]+", " ", line).rstrip() for line in text.splitlines()]
+    text = re.sub(r" +([:.,;])", r"\1", "\n".join(lines))
+    return re.sub(r"\n{2,}", "\n", text).strip()
+
+
+def shorten_examples(name, text):
+    """Recorta las secciones de ejemplos a lo mínimo que conserva el patrón."""
+    lines = text.strip().splitlines()
+    if name == "oo_domain_examples":
+        # Título + primer ejemplo completo (con su redirección)
+        first_example = [i for i, line in enumerate(lines) if line.lstrip().startswith("- ")][:2]
+        return "\n".join(lines[:first_example[1]]) if len(first_example) == 2 else text
+    if name == "closing_cta":
+        # Un solo ejemplo de CTA
+        options = [i for i, line in enumerate(lines) if line.lstrip().startswith("- ")]
+        keep = set(options[1:])
+        return "\n".join(line for i, line in enumerate(lines) if i not in keep)
+    if name == "response_template":
+        # La guía de formato visual (punto 6) no cambia el contenido de la respuesta
+        cut = next((i for i, line in enumerate(lines) if "6)" in line), len(lines))
+        return "\n".join(lines[:cut])
+    return text
+
+
+# --- 2. VARIANTES ---
+
+def build_variant(variant):
+    if variant == "full":
+        return prompts.stronger_prompt
+
+    parts = []
+    for name, text in SECTIONS:
+        if variant == "minimal":
+            text = shorten_examples(name, text)
+        text = strip_emoji(text)
+        text = strip_emphasis(text)
+        text = remove_redundant(text)
+        parts.append(collapse_whitespace(text))
+    return "\n\n".join(parts)
+
+
+def count_tokens(text):
+    """Tokens con tiktoken si está instalado; si no, una aproximación por palabras y símbolos."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    except ImportError:
+        return approximate_tokens(text)
+
+
+def approximate_tokens(text):
+    """Aproximación de tokens por palabras y símbolos (sin tiktoken)."""
+    words = re.findall(r"\w+", text)
+    symbols = re.findall(r"[^\w\s]", text)
+    return int(sum(1 + len(w) // 6 for w in words) + len(symbols))
+
+
+def build_all():
+    variants = {}
+    for variant in VARIANTS:
+        text = build_variant(variant)
+        variants[variant] = {
+            "text": text,
+            "chars": len(text),
+            "tokens": count_tokens(text),
+            "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        }
+    return variants
+
+
+def write_build(path=BUILD_PATH):
+    variants = build_all()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(variants, f, ensure_ascii=False, indent=2)
+    return variants
+
+
+# --- 3. SELECCIÓN EN TIEMPO DE EJECUCIÓN ---
+
+@functools.lru_cache(maxsize=None)
+def _load_variants():
+    """Usa el artefacto del build si existe (y coincide con prompts.py); si no, construye en memoria."""
+    if os.path.exists(BUILD_PATH):
+        with open(BUILD_PATH, "r", encoding="utf-8") as f:
+            built = json.load(f)
+        full_sha = hashlib.sha256(prompts.stronger_prompt.encode("utf-8")).hexdigest()
+        if built.get("full", {}).get("sha256") == full_sha:
+            return {name: v["text"] for name, v in built.items()}
+        print("⚠️ build/prompt_variants.json está desactualizado respecto a prompts.py. Reconstruyendo en memoria.")
+    return {variant: build_variant(variant) for variant in VARIANTS}
+
+
+def selected_variant(app):
+    variant = os.getenv(f"PROMPT_VARIANT_{app.upper()}") or os.getenv("PROMPT_VARIANT") or DEFAULT_VARIANT
+    if variant not in VARIANTS:
+        print(f"⚠️ Variante de prompt desconocida '{variant}' para {app}. Usando '{DEFAULT_VARIANT}'.")
+        return DEFAULT_VARIANT
+    return variant
+
+
+def get_prompt(app):
+    """Prompt base para la app indicada según su variante configurada."""
+    return _load_variants()[selected_variant(app)]
+
+
+if __name__ == "__main__":
+    built = write_build()
+    full_tokens = built["full"]["tokens"]
+    print(f"Variantes escritas en {BUILD_PATH}\n")
+    for name, v in built.items():
+        print(f"{name:<8} {v['chars']:>6} caracteres  {v['tokens']:>5} tokens  ({v['tokens'] / full_tokens:.0%} del original)")
@@ -0,0 +1,429 @@
+import os
+import json
+import hashlib
+import threading
+import datetime
+import requests
+
+# --- BANCO DE PREGUNTAS LOCAL (ESPEJO DE N8N) ---
+#
+# Copia local y versionada del catálogo de preguntas (Google Sheet vía n8n).
+# La app lee siempre de memoria; un hilo en segundo plano pide a n8n solo los
+# cambios desde la última versión conocida. Si no hay red, se sigue sirviendo
+# la última versión buena guardada en disco.
+#
+# Contrato de sincronización con el Flujo 1 de n8n (N8N_URL_FETCH_Q):
+#   Petición:  POST {"tipo_evento": "SYNC_PREGUNTAS", "version": <token>}
+#              + cabecera If-None-Match: <etag> si se conoce.
+#   Respuesta: 304 -> sin cambios.
+#              {"version": ..., "questions": [...], "deleted": [...], "full": bool}
+#              -> cambios incrementales (catálogo completo solo si full=true).
+#              [...] -> lista completa (formato antiguo), reemplaza todo.
+#   Si n8n no envía versión ni ETag, la versión se calcula localmente (hash del
+#   catálogo, prefijo "local-") y no se le reenvía: una sincronización que no
+#   cambia nada no reescribe el archivo.
+#
+# Cada pregunta debe traer rol_jerarquico y area_proceso (un valor, varios
+# separados por coma, o '*'/'Todos' para aplicar a todos). Si alguna llega sin
+# ellos, la sincronización se rechaza y se conserva la versión anterior: una
+# columna borrada o renombrada en la hoja no debe mostrar todas las preguntas a
+# todos los perfiles.
+
+WILDCARD = "*"
+LOCAL_VERSION_PREFIX = "local-"
+SCOPE_FIELDS = (("rol_jerarquico", "Rol_Jerarquico"), ("area_proceso", "Area_Proceso"))
+
+
+def normalize_question_keys(question_data):
+    """
+    Normaliza las claves de las preguntas de snake_case (n8n) a PascalCase (app).
+    """
+    key_mapping = {
+        'id_pregunta': 'ID_Pregunta',
+        'pregunta_texto': 'Texto_Pregunta',
+    }
+
+    normalized = {}
+    for old_key, new_key in key_mapping.items():
+        if old_key in question_data:
+            normalized[new_key] = question_data[old_key]
+        elif new_key in question_data:
+            normalized[new_key] = question_data[new_key]
+        else:
+            normalized[new_key] = 'N/A'
+
+    return {**question_data, **normalized}
+
+
+def _scope_values(value):
+    """Convierte la celda de rol/área en una lista de valores; solo '*' o 'Todos' aplica a todos. Vacío -> []."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        values = [str(v).strip() for v in value if str(v).strip()]
+    else:
+        values = [v.strip() for v in str(value).split(",") if v.strip()]
+    if any(v in (WILDCARD, "Todos") for v in values):
+        return [WILDCARD]
+    return values
+
+
+def _scope(question):
+    """Listas (roles, áreas) de una pregunta."""
+    return [_scope_values(question.get(key, question.get(alias))) for key, alias in SCOPE_FIELDS]
+
+
+def missing_scope(questions):
+    """IDs de las preguntas sin rol_jerarquico o area_proceso."""
+    return [q['ID_Pregunta'] for q in questions if not all(_scope(q))]
+
+
+def catalog_version(questions):
+    """Versión local del catálogo (cuando n8n no la envía): hash de su contenido."""
+    raw = json.dumps(list(questions), ensure_ascii=False, sort_keys=True, default=str)
+    return LOCAL_VERSION_PREFIX + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def build_index(questions):
+    """Crea el índice 'rol|area' -> [ID_Pregunta] respetando el orden del catálogo (omite las preguntas sin rol/área)."""
+    index = {}
+    for q in questions:
+        roles, areas = _scope(q)
+        for rol in roles:
+            for area in areas:
+                index.setdefault(f"{rol}|{area}", []).append(q['ID_Pregunta'])
+    return index
+
+
+class QuestionBank:
+    """Espejo local del catálogo de preguntas con sincronización incremental."""
+
+    def __init__(self, path, sync_url, sync_interval=300):
+        self.path = path
+        self.sync_url = sync_url
+        self.sync_interval = sync_interval
+
+        self._lock = threading.Lock()
+        self._questions = {}
+        self._index = {}
+        self.version = None
+        self.etag = None
+        self.synced_at = None
+        self.last_error = None
+        self._sync_thread = None
+        self._stop = threading.Event()
+        self._mtime = None
+
+        self._load()
+
+    # --- Lectura (memoria) ---
+
+    def get(self, rol, area):
+        """Devuelve las preguntas aplicables a un rol/área sin tocar la red."""
+        self._reload_if_changed()
+        with self._lock:
+            keys = (f"{rol}|{area}", f"{rol}|{WILDCARD}", f"{WILDCARD}|{area}", f"{WILDCARD}|{WILDCARD}")
+            wanted = set()
+            for key in keys:
+                wanted.update(self._index.get(key, []))
+            # El orden es el del catálogo, no el de las claves del índice
+            return [dict(q) for qid, q in self._questions.items() if qid in wanted]
+
+    def is_empty(self):
+        self._reload_if_changed()
+        with self._lock:
+            return not self._questions
+
+    # --- Persistencia ---
+
+    def _reload_if_changed(self):
+        """Recarga el archivo si otro proceso del host lo sincronizó después que nosotros."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                self._load()
+
+    def _load(self):
+        """Carga la última versión buena desde disco (si existe)."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Banco de preguntas ilegible en {self.path}: {e}. Se ignorará.")
+            return
+        self._mtime = os.stat(self.path).st_mtime
+
+        questions = data.get("questions", [])
+        self._questions = {q['ID_Pregunta']: q for q in questions}
+        self._index = data.get("index") or build_index(questions)
+        unscoped = missing_scope(questions)
+        if unscoped:
+            # Banco guardado antes de exigir rol/área: esas preguntas no se sirven
+            print(f"❌ Banco de preguntas en {self.path}: {len(unscoped)} preguntas sin rol_jerarquico o area_proceso; se omiten.")
+            self._index = build_index(questions)
+        self.version = data.get("version")
+        self.etag = data.get("etag")
+        self.synced_at = data.get("synced_at")
+
+    def _save(self):
+        """Escribe el banco de forma atómica (archivo temporal + reemplazo)."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": self.version,
+            "etag": self.etag,
+            "synced_at": self.synced_at,
+            "questions": list(self._questions.values()),
+            "index": self._index,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime
+
+    # --- Sincronización con n8n ---
+
+    def sync(self):
+        """
+        Pide a n8n los cambios desde la versión local y los aplica.
+        Retorna True si hubo cambios. Ante cualquier error conserva la versión actual.
+        """
+        if not self.sync_url or "<Webhook URL" in self.sync_url:
+            self.last_error = "N8N_URL_FETCH_Q no está configurada."
+            return False
+
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        # Una versión calculada localmente no significa nada para n8n
+        remote_version = None if str(self.version).startswith(LOCAL_VERSION_PREFIX) else self.version
+        payload = {"tipo_evento": "SYNC_PREGUNTAS", "version": remote_version}
+
+        try:
+            response = requests.post(self.sync_url, json=payload, headers=headers, timeout=10)
+        except requests.exceptions.RequestException as e:
+            self.last_error = f"Sin conexión con n8n: {e}"
+            return False
+
+        if response.status_code == 304:
+            self.last_error = None
+            return False
+        if not (200 <= response.status_code < 300):
+            self.last_error = f"n8n respondió {response.status_code}: {response.text[:200]}"
+            return False
+
+        try:
+            body = response.json()
+        except json.JSONDecodeError:
+            self.last_error = "n8n devolvió una respuesta que no es JSON."
+            return False
+
+        if isinstance(body, list):
+            changes, deleted, full, version = body, [], True, None
+        elif isinstance(body, dict):
+            changes = body.get("questions") or []
+            deleted = body.get("deleted") or []
+            full = bool(body.get("full", False))
+            version = body.get("version")
+        else:
+            self.last_error = "Formato de respuesta de sincronización desconocido."
+            return False
+
+        # La normalización se hace una sola vez aquí, no en cada petición
+        normalized = [normalize_question_keys(q) for q in changes if isinstance(q, dict)]
+        if any(q['ID_Pregunta'] == 'N/A' for q in normalized):
+            self.last_error = "Claves faltantes en la respuesta de n8n. Se conserva la versión anterior."
+            return False
+
+        # Sin rol/área una pregunta no se puede filtrar: se rechaza el catálogo completo
+        unscoped = missing_scope(normalized)
+        if unscoped:
+            self.last_error = (f"{len(unscoped)} preguntas sin rol_jerarquico o area_proceso "
+                               f"({', '.join(map(str, unscoped[:5]))}). Se conserva la versión anterior.")
+            print(f"❌ BANCO DE PREGUNTAS: {self.last_error}")
+            return False
+
+        with self._lock:
+            questions = {} if full else dict(self._questions)
+            for qid in deleted:
+                questions.pop(qid, None)
+            for q in normalized:
+                questions[q['ID_Pregunta']] = q
+
+            new_version = version or response.headers.get("ETag") or catalog_version(questions.values())
+            if questions == self._questions and new_version == self.version:
+                self.last_error = None
+                return False
+
+            self._questions = questions
+            self._index = build_index(questions.values())
+            self.version = new_version
+            self.etag = response.headers.get("ETag") or self.etag
+            self.synced_at = datetime.datetime.now().isoformat()
+            self.last_error = None
+            self._save()
+
+        print(f"--- BANCO DE PREGUNTAS: {len(normalized)} cambios, {len(deleted)} borradas, versión {self.version} ---")
+        return True
+
+    def start_background_sync(self):
+        """Arranca (una sola vez) el hilo que sincroniza periódicamente con n8n."""
+        if self._sync_thread and self._sync_thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.sync()
+                except Exception as e:  # El hilo nunca debe morir por un error puntual
+                    self.last_error = f"Error inesperado en la sincronización: {e}"
+                self._stop.wait(self.sync_interval)
+
+        self._sync_thread = threading.Thread(target=loop, name="question-bank-sync", daemon=True)
+        self._sync_thread.start()
+
+
+# --- CARGA PAGINADA (PRIMER ARRANQUE O CATÁLOGOS GRANDES) ---
+#
+# Mientras el banco local no tiene datos, las preguntas de una sesión se piden
+# a n8n por páginas, ya filtradas por rol/área. La primera página se muestra de
+# inmediato y las siguientes se precargan en segundo plano según avanza el
+# usuario.
+#
+# Contrato con el Flujo 1 de n8n (N8N_URL_FETCH_Q):
+#   Petición:  POST {"tipo_evento": "PAGINA_PREGUNTAS", "rol_jerarquico": ...,
+#                    "area_proceso": ..., "page": 1, "page_size": 10}
+#   Respuesta: {"questions": [...], "page": 1, "has_more": bool, "total": int | null}
+#              [...] -> flujo sin paginar: todas las preguntas en una sola página.
+
+def fetch_page(url, rol, area, page, page_size, timeout=10):
+    """Pide una página de preguntas (filtradas por rol/área en n8n) y la normaliza."""
+    payload = {
+        "tipo_evento": "PAGINA_PREGUNTAS",
+        "rol_jerarquico": rol,
+        "area_proceso": area,
+        "page": page,
+        "page_size": page_size,
+    }
+    if not url or "<Webhook URL" in url:
+        raise ValueError("N8N_URL_FETCH_Q no está configurada.")
+
+    response = requests.post(url, json=payload, timeout=timeout)
+    if not (200 <= response.status_code < 300):
+        raise ValueError(f"n8n respondió {response.status_code}: {response.text[:200]}")
+    try:
+        body = response.json()
+    except json.JSONDecodeError:
+        raise ValueError("n8n devolvió una respuesta que no es JSON.")
+
+    if isinstance(body, list):
+        rows, has_more, total = body, False, len(body)
+    elif isinstance(body, dict):
+        rows, has_more, total = body.get("questions") or [], bool(body.get("has_more")), body.get("total")
+    else:
+        raise ValueError("Formato de página de preguntas desconocido.")
+
+    questions = [normalize_question_keys(q) for q in rows if isinstance(q, dict)]
+    if any(q['ID_Pregunta'] == 'N/A' for q in questions):
+        raise ValueError("Claves faltantes en la respuesta de n8n.")
+    return {"questions": questions, "has_more": has_more, "total": total}
+
+
+class QuestionPager:
+    """Preguntas de un rol/área cargadas página por página, con precarga en segundo plano."""
+
+    def __init__(self, url, rol, area, page_size=10, prefetch_ahead=3):
+        self.url = url
+        self.rol = rol
+        self.area = area
+        self.page_size = page_size
+        self.prefetch_ahead = prefetch_ahead
+
+        # Lista compartida con st.session_state['questions_list']: las páginas nuevas se agregan aquí
+        self.questions = []
+        self.next_page = 1
+        self.has_more = True
+        self.total = None
+        self.last_error = None
+
+        self._fetch_lock = threading.Lock()
+        # Protege questions + has_more para leerlos juntos sin esperar la descarga en curso
+        self._state_lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def resume(cls, url, state, questions):
+        """Recrea un paginador desde una instantánea de sesión (ver state())."""
+        pager = cls(url, state["rol"], state["area"], page_size=state["page_size"])
+        pager.questions = questions
+        pager.next_page = state["next_page"]
+        pager.has_more = state["has_more"]
+        pager.total = state["total"]
+        return pager
+
+    def state(self):
+        with self._state_lock:
+            return {
+                "rol": self.rol,
+                "area": self.area,
+                "page_size": self.page_size,
+                "next_page": self.next_page,
+                "has_more": self.has_more,
+                "total": self.total,
+            }
+
+    @property
+    def complete(self):
+        return not self.has_more
+
+    def progress(self):
+        """(preguntas cargadas, hay más) leídos juntos: la precarga no puede colarse entre ambos."""
+        with self._state_lock:
+            return len(self.questions), self.has_more
+
+    def fetch_next(self):
+        """Descarga la siguiente página (bloqueante). Un error corta la paginación y queda en last_error."""
+        with self._fetch_lock:
+            if not self.has_more:
+                return
+            try:
+                page = fetch_page(self.url, self.rol, self.area, self.next_page, self.page_size)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                with self._state_lock:
+                    self.last_error = f"No se pudo cargar la página {self.next_page}: {e}"
+                    self.has_more = False
+                return
+
+            with self._state_lock:
+                known = {q['ID_Pregunta'] for q in self.questions}
+                self.questions.extend(q for q in page["questions"] if q['ID_Pregunta'] not in known)
+                self.total = page["total"] if page["total"] is not None else self.total
+                self.has_more = page["has_more"] and bool(page["questions"])
+                self.next_page += 1
+            self.last_error = None
+
+    def prefetch(self, index):
+        """Si el usuario se acerca al final de lo cargado, pide la siguiente página en segundo plano."""
+        if not self.has_more or index + self.prefetch_ahead < len(self.questions):
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.fetch_next, name="question-prefetch", daemon=True)
+        self._thread.start()
+
+    def wait_for(self, index):
+        """Bloquea hasta que la pregunta `index` esté cargada (o no haya más). Retorna si existe."""
+        while index >= len(self.questions) and self.has_more:
+            self.fetch_next()
+        return index < len(self.questions)
+
+    def load_all(self):
+        while self.has_more:
+            self.fetch_next()
+        return self.questions
@@ -0,0 +1,366 @@
+"""
+Benchmark de regresión: reproduce trazas reales de sesión contra backends simulados.
+
+Cada traza (grabada con TECH_IDEAS_RECORD_TRACES=1, ver session_trace.py) se
+reproduce paso a paso sobre main_01.py / main_02.py / main_04.py con
+streamlit.testing (AppTest), sustituyendo n8n y el proveedor LLM por stubs
+deterministas. Por cada paso se mide latencia y memoria asignada (tracemalloc).
+
+Uso:
+    python replay_bench.py traces/ --repeat 3 --out reporte_nuevo.json
+    python replay_bench.py traces/ --baseline reporte_viejo.json --threshold 0.2
+    python replay_bench.py --convert-n8n fin_sesion.json --script main_02.py
+
+Con --baseline, los pasos que empeoren más que el umbral se marcan como
+regresión y el proceso termina con código 1.
+
+El banco de preguntas se siembra antes de reproducir (main_04 sirve siempre
+desde el banco local). Con --cold-bank el stub no responde a la sincronización
+y main_04 usa siempre la carga paginada. Así el camino no depende del hilo de
+sincronización en segundo plano.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import datetime
+import tempfile
+import statistics
+import tracemalloc
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STUB_FETCH_URL = "http://n8n.stub/fetch_questions"
+STUB_SAVE_URL = "http://n8n.stub/save_answer"
+STUB_SESSION_URL = "http://n8n.stub/session"
+
+# Diferencias menores que esto se consideran ruido aunque superen el umbral relativo
+MIN_DELTA_MS = 10.0
+MIN_DELTA_KB = 64.0
+
+
+# --- 1. BACKENDS SIMULADOS ---
+
+class StubResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+        self.text = json.dumps(body, ensure_ascii=False)
+        self.content = self.text.encode("utf-8")
+        self.headers = {}
+
+    def json(self):
+        return self._body
+
+
+class StubWebhook:
+    """Sustituye requests.post / Session.post: responde como los flujos de n8n, sin red."""
+
+    def __init__(self, question_count=6, sync_available=True):
+        # Sin sincronización (--cold-bank) el banco local queda vacío: main_04 pagina
+        self.sync_available = sync_available
+        self.questions = [
+            {"id_pregunta": f"Q{i:02d}", "pregunta_texto": f"Pregunta simulada número {i}", "rol_jerarquico": "Todos", "area_proceso": "Todos"}
+            for i in range(1, question_count + 1)
+        ]
+        self.calls = []
+
+    def __call__(self, url, json=None, **kwargs):
+        self.calls.append((url, json))
+        if url == STUB_FETCH_URL:
+            if json and json.get("tipo_evento") == "SYNC_PREGUNTAS":
+                if not self.sync_available:
+                    return StubResponse(503, {"message": "Sincronización no disponible"})
+                return StubResponse(200, {"version": "stub-1", "full": True, "questions": self.questions})
+            if json and json.get("tipo_evento") == "PAGINA_PREGUNTAS":
+                start = (json["page"] - 1) * json["page_size"]
+                page = self.questions[start:start + json["page_size"]]
+                return StubResponse(200, {"questions": page, "has_more": start + len(page) < len(self.questions), "total": len(self.questions)})
+            return StubResponse(200, self.questions)
+        if json and json.get("tipo_evento") == "LOTE_RESPUESTAS":
+            return StubResponse(200, {"resultados": [{"id_pregunta": r["id_pregunta"], "status": "ok"} for r in json["respuestas"]]})
+        return StubResponse(200, {"status": "success"})
+
+
+class _StubCompletions:
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        # Respuesta determinista: depende solo de la longitud de la conversación
+        words = [f"respuesta{len(messages)}"] + ["simulada"] * 40
+        if stream:
+            return iter(f"{w} " for w in words)
+        return " ".join(words)
+
+
+class _StubChat:
+    def __init__(self):
+        self.completions = _StubCompletions()
+
+
+class StubOpenAI:
+    """Sustituye openai.OpenAI con un proveedor sin red y sin latencia."""
+
+    def __init__(self, *args, **kwargs):
+        self.chat = _StubChat()
+
+
+# --- 2. REPRODUCCIÓN DE TRAZAS ---
+
+def _button(at, *prefixes):
+    for button in at.button:
+        if any(str(button.label).startswith(p) for p in prefixes):
+            return button
+    raise LookupError(f"No se encontró un botón que empiece por {prefixes}")
+
+
+def apply_step(at, step):
+    """Traduce un paso de la traza a interacciones de AppTest."""
+    action = step["action"]
+    if action == "metadata":
+        at.text_input(key="form_user_id").input(step["nombre_id"])
+        at.selectbox(key="form_role").select(step["rol"])
+        at.selectbox(key="form_area").select(step["area"])
+        _button(at, "🚀 Comenzar").click()
+    elif action == "chat":
+        at.chat_input[0].set_value(step["text"])
+    elif action == "answer":
+        at.text_area(key="current_answer_input").input(step["text"])
+        _button(at, "Guardar Respuesta", "Finalizar Entrevista").click()
+    elif action == "mode":
+        at.radio(key="interview_mode").set_value(step["mode"])
+    elif action == "bulk":
+        areas = [ta for ta in at.text_area if ta.key and ta.key.startswith("bulk_answer_")]
+        for text_area, text in zip(areas, step["answers"]):
+            text_area.input(text)
+        _button(at, "Guardar Todas").click()
+    elif action == "abandon":
+        _button(at, "Terminar sin Guardar").click()
+    elif action == "finish":
+        _button(at, "👋 Finalizar Sesión").click()
+    else:
+        raise ValueError(f"Acción desconocida en la traza: {action}")
+
+
+def replay_trace(trace, timeout=30):
+    """Reproduce una traza y devuelve las métricas de cada paso."""
+    from streamlit.testing.v1 import AppTest
+    import shared_cache
+
+    # Caché limpia en cada repetición: si no, la 2ª vez todo serían aciertos
+    shared_cache.get_cache().clear()
+
+    at = AppTest.from_file(os.path.join(REPO_DIR, trace["script"]), default_timeout=timeout)
+    results = []
+
+    def measure(label, fn):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        fn()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        after, peak = tracemalloc.get_traced_memory()
+        if at.exception:
+            raise RuntimeError(f"El script falló en el paso '{label}': {at.exception[0].message}")
+        results.append({
+            "action": label,
+            "ms": elapsed_ms,
+            "alloc_kb": (peak - before) / 1024,
+            "retained_kb": (after - before) / 1024,
+        })
+
+    measure("load", at.run)
+    for step in trace["steps"]:
+        measure(step["action"], lambda: (apply_step(at, step), at.run()))
+    return results
+
+
+def run_benchmark(traces, repeat, warmup=1, cold_bank=False):
+    webhook = StubWebhook(sync_available=not cold_bank)
+    env = {
+        "N8N_URL_FETCH_Q": STUB_FETCH_URL,
+        "N8N_URL_SAVE_A": STUB_SAVE_URL,
+        "N8N_WEBHOOK_URL": STUB_SESSION_URL,
+        "QUESTION_BANK_PATH": os.path.join(tempfile.mkdtemp(prefix="replay_bank_"), "bank.json"),
+        "QUESTION_BANK_SYNC_SECONDS": "86400",
+        "SHARED_CACHE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='replay_cache_'), 'cache.sqlite3')}",
+        "ANALYTICS_DIR": tempfile.mkdtemp(prefix="replay_analytics_"),
+        "TRANSCRIPTS_DIR": tempfile.mkdtemp(prefix="replay_transcripts_"),
+        "TECH_IDEAS_PROFILE": "",
+        "TECH_IDEAS_RECORD_TRACES": "",
+    }
+
+    report = {"generated_at": datetime.datetime.now().isoformat(), "repeat": repeat, "warmup": warmup, "traces": {}}
+
+    tracemalloc.start()
+    with mock.patch.dict(os.environ, env), \
+            mock.patch("dotenv.load_dotenv", lambda *a, **k: False), \
+            mock.patch("requests.post", webhook), \
+            mock.patch("requests.Session.post", webhook), \
+            mock.patch("openai.OpenAI", StubOpenAI):
+        if not cold_bank:
+            # Banco sembrado de forma síncrona antes de la primera traza
+            from question_bank import QuestionBank
+            QuestionBank(env["QUESTION_BANK_PATH"], STUB_FETCH_URL).sync()
+        for name, trace in traces.items():
+            # Las corridas de calentamiento absorben imports y cachés del proceso
+            for _ in range(warmup):
+                replay_trace(trace)
+            runs = [replay_trace(trace) for _ in range(repeat)]
+            # Mediana por paso entre repeticiones
+            steps = []
+            for i, first in enumerate(runs[0]):
+                steps.append({
+                    "step": i,
+                    "action": first["action"],
+                    **{m: statistics.median(r[i][m] for r in runs) for m in ("ms", "alloc_kb", "retained_kb")},
+                })
+            report["traces"][name] = {
+                "script": trace["script"],
+                "steps": steps,
+                "total_ms": sum(s["ms"] for s in steps),
+            }
+            print(f"✅ {name}: {len(steps)} pasos, {report['traces'][name]['total_ms']:.1f} ms")
+    tracemalloc.stop()
+    return report
+
+
+# --- 3. COMPARACIÓN ENTRE VERSIONES ---
+
+def compare(current, baseline, threshold):
+    """Devuelve la lista de pasos que empeoraron más que el umbral respecto al baseline."""
+    regressions = []
+    for name, trace in current["traces"].items():
+        base_trace = baseline["traces"].get(name)
+        if not base_trace:
+            continue
+        for step, base_step in zip(trace["steps"], base_trace["steps"]):
+            for metric, min_delta in (("ms", MIN_DELTA_MS), ("alloc_kb", MIN_DELTA_KB)):
+                now, before = step[metric], base_step[metric]
+                if now > before * (1 + threshold) and now - before > min_delta:
+                    regressions.append({
+                        "trace": name,
+                        "step": step["step"],
+                        "action": step["action"],
+                        "metric": metric,
+                        "baseline": before,
+                        "current": now,
+                        "change": (now - before) / before if before else float("inf"),
+                    })
+    return regressions
+
+
+def print_report(report, baseline=None):
+    for name, trace in report["traces"].items():
+        base_steps = (baseline or {}).get("traces", {}).get(name, {}).get("steps", [])
+        print(f"\n--- {name} ({trace['script']}) ---")
+        print(f"{'paso':>4} {'acción':<10} {'ms':>9} {'alloc KB':>10} {'Δ ms':>8}")
+        for step in trace["steps"]:
+            delta = ""
+            if step["step"] < len(base_steps) and base_steps[step["step"]]["ms"]:
+                delta = f"{(step['ms'] / base_steps[step['step']]['ms'] - 1):+.0%}"
+            print(f"{step['step']:>4} {step['action']:<10} {step['ms']:>9.1f} {step['alloc_kb']:>10.1f} {delta:>8}")
+
+
+# --- 4. TRAZAS A PARTIR DE PAYLOADS DE N8N ---
+
+def trace_from_n8n(payload, script):
+    """
+    Convierte lo que ya enviamos a n8n en una traza reproducible:
+    - dict FIN_SESION (main_01/main_02): historial_completo_json -> pasos 'chat'.
+    - lista de payloads de respuesta (main_04): respuesta_texto -> pasos 'answer'.
+    """
+    import session_trace
+
+    steps = []
+    if isinstance(payload, dict):
+        metadata = payload.get("metadata_inicial", {})
+        if script != "main_01.py":
+            steps.append({"action": "metadata", "nombre_id": session_trace.pseudonymize(metadata.get("nombre_id", "N/A")),
+                          "rol": metadata.get("rol_jerarquico", "Director"), "area": metadata.get("area_proceso", "General")})
+        for msg in payload.get("historial_completo_json", []):
+            if msg.get("role") == "user":
+                steps.append({"action": "chat", "text": session_trace.sanitize_text(msg["content"])})
+        if script == "main_02.py":
+            steps.append({"action": "finish"})
+    else:
+        first = payload[0] if payload else {}
+        steps.append({"action": "metadata", "nombre_id": session_trace.pseudonymize(first.get("nombre_id", "N/A")),
+                      "rol": first.get("rol_jerarquico", "Director"), "area": first.get("area_proceso", "General")})
+        for answer in sorted(payload, key=lambda a: a.get("timestamp_respuesta", "")):
+            steps.append({"action": "answer", "text": session_trace.sanitize_text(answer.get("respuesta_texto", ""))})
+
+    for i, step in enumerate(steps):
+        step["t"] = float(i)
+    return {"trace_id": f"n8n_{datetime.datetime.now():%Y%m%d%H%M%S}", "script": script,
+            "recorded_at": datetime.datetime.now().isoformat(), "steps": steps}
+
+
+def load_traces(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path])
+    traces = {}
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            traces[os.path.basename(file)] = json.load(f)
+    return traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="*", default=[os.getenv("TECH_IDEAS_TRACE_DIR", "traces")])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Corridas previas no medidas por traza.")
+    parser.add_argument("--out", help="Ruta donde guardar el reporte JSON.")
+    parser.add_argument("--baseline", help="Reporte JSON de la versión anterior para comparar.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo tolerado (0.2 = 20%%).")
+    parser.add_argument("--cold-bank", action="store_true", help="Sin banco local: main_04 carga las preguntas por páginas.")
+    parser.add_argument("--convert-n8n", help="Payload de n8n (FIN_SESION o lista de respuestas) a convertir en traza.")
+    parser.add_argument("--script", default="main_02.py", help="Script destino de la traza convertida.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+
+    if args.convert_n8n:
+        with open(args.convert_n8n, "r", encoding="utf-8") as f:
+            trace = trace_from_n8n(json.load(f), args.script)
+        trace_dir = os.getenv("TECH_IDEAS_TRACE_DIR", "traces")
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(trace_dir, f"{os.path.splitext(args.script)[0]}_{trace['trace_id']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False, indent=2)
+        print(f"Traza guardada en {path}")
+        return
+
+    traces = load_traces(args.traces)
+    if not traces:
+        sys.exit("No se encontraron trazas. Grábelas con TECH_IDEAS_RECORD_TRACES=1.")
+
+    report = run_benchmark(traces, args.repeat, args.warmup, cold_bank=args.cold_bank)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReporte guardado en {args.out}")
+
+    if baseline:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones por encima del {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r['trace']} paso {r['step']} ({r['action']}) {r['metric']}: "
+                      f"{r['baseline']:.1f} -> {r['current']:.1f} ({r['change']:+.0%})")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto al baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import datetime
+
+import streamlit as st
+
+# --- GRABADOR DE TRAZAS DE SESIÓN ---
+#
+# Con TECH_IDEAS_RECORD_TRACES=1 cada sesión guarda la secuencia de entradas del
+# usuario (formulario, respuestas, lotes de respuestas, mensajes de chat, clics) con su tiempo
+# relativo en TECH_IDEAS_TRACE_DIR/<script>_<id>.json. Las trazas se sanitizan:
+# el nombre_id se seudonimiza y se enmascaran correos y números largos.
+#
+# replay_bench.py reproduce estas trazas contra backends simulados.
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+LONG_NUMBER_RE = re.compile(r"\d[\d\s-]{5,}\d")
+
+
+def enabled():
+    return os.getenv("TECH_IDEAS_RECORD_TRACES", "").strip().lower() in ("1", "true", "yes")
+
+
+def _trace_dir():
+    return os.getenv("TECH_IDEAS_TRACE_DIR", "traces")
+
+
+def pseudonymize(user_id):
+    return "user_" + hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()[:8]
+
+
+def sanitize_text(text):
+    text = EMAIL_RE.sub("<email>", str(text))
+    return LONG_NUMBER_RE.sub("<numero>", text)
+
+
+def record(script, action, **data):
+    """Agrega un paso a la traza de la sesión actual y la reescribe en disco."""
+    if not enabled():
+        return
+
+    trace = st.session_state.get('_trace')
+    if trace is None or trace['script'] != script:
+        trace = {
+            "trace_id": uuid.uuid4().hex[:12],
+            "script": script,
+            "recorded_at": datetime.datetime.now().isoformat(),
+            "started": time.time(),
+            "steps": [],
+        }
+        st.session_state['_trace'] = trace
+
+    if 'nombre_id' in data:
+        data['nombre_id'] = pseudonymize(data['nombre_id'])
+    if 'text' in data:
+        data['text'] = sanitize_text(data['text'])
+    if 'answers' in data:
+        data['answers'] = [sanitize_text(answer) for answer in data['answers']]
+
+    trace['steps'].append({"t": round(time.time() - trace['started'], 3), "action": action, **data})
+
+    os.makedirs(_trace_dir(), exist_ok=True)
+    path = os.path.join(_trace_dir(), f"{os.path.splitext(script)[0]}_{trace['trace_id']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in trace.items() if k != "started"}, f, ensure_ascii=False, indent=2)
+
+
+def reset():
+    """Cierra la traza actual; la siguiente interacción empieza una nueva."""
+    st.session_state.pop('_trace', None)
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# --- CACHÉ Y ESTADO COMPARTIDO ENTRE PROCESOS ---
+#
+# Permite correr varios procesos de Streamlit (detrás de un balanceador) en el
+# mismo host compartiendo lo que es caro de recalcular (respuestas del LLM) y las
+# instantáneas de sesión. Lo barato (prompts ensamblados, listas de preguntas del
+# banco local) se cachea en la memoria de cada proceso: un viaje a SQLite o Redis
+# en cada rerun costaría más que recalcularlo.
+#
+# Backend por defecto: SQLite en modo WAL (un archivo local, lecturas concurrentes).
+# Backend opcional: Redis (o compatible) con SHARED_CACHE_URL=redis://host:6379/0
+# (requiere `pip install redis`).
+#
+# Ambos backends aplican la misma política de expulsión por namespace:
+# TTL + máximo de entradas, expulsando primero las menos usadas recientemente (LRU).
+
+DEFAULT_CACHE_URL = "sqlite:///data/shared_cache.sqlite3"
+
+# namespace: (ttl en segundos, máximo de entradas)
+NAMESPACES = {
+    "llm": (24 * 3600, 5000),
+    "sessions": (12 * 3600, 10000),
+}
+
+# Cada cuántas escrituras (por namespace y proceso) se revisa la expulsión (evita un
+# COUNT en cada set). En namespaces pequeños se revisa antes: a lo sumo se excede
+# el máximo en una cuarta parte.
+EVICTION_CHECK_EVERY = 64
+# No se reescribe la marca de acceso LRU si es más reciente que esto (segundos)
+TOUCH_GRANULARITY = 5
+
+
+def cache_key(*parts):
+    """Clave estable (sha256) a partir de cualquier combinación de partes serializables."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _namespace_policy(namespace):
+    if namespace not in NAMESPACES:
+        raise KeyError(f"Namespace de caché desconocido: {namespace}")
+    return NAMESPACES[namespace]
+
+
+class SQLiteCache:
+    """Backend SQLite: un archivo compartido por todos los procesos del host."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        # Contador de escrituras por namespace, común a todos los hilos del proceso
+        # (Streamlit usa un hilo nuevo por interacción: un contador por hilo casi nunca llega al umbral)
+        self._writes = {}
+        self._writes_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache (namespace, accessed_at)")
+
+    def _conn(self):
+        """Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, default=None):
+        _namespace_policy(namespace)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return default
+
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at < now:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            return default
+        if now - accessed_at > TOUCH_GRANULARITY:
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+        return json.loads(value)
+
+    def set(self, namespace, key, value):
+        ttl, _ = _namespace_policy(namespace)
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+        )
+        if self._should_evict(namespace):
+            self.evict(namespace)
+
+    def _should_evict(self, namespace):
+        _, max_entries = _namespace_policy(namespace)
+        every = min(EVICTION_CHECK_EVERY, max(1, max_entries // 4))
+        with self._writes_lock:
+            self._writes[namespace] = self._writes.get(namespace, 0) + 1
+            return self._writes[namespace] % every == 0
+
+    def delete(self, namespace, key):
+        self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def evict(self, namespace):
+        """Borra las entradas vencidas y, si sobran, las menos usadas recientemente."""
+        _, max_entries = _namespace_policy(namespace)
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at < ?", (namespace, time.time()))
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            " SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (namespace, namespace, max_entries),
+        )
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._conn().execute("DELETE FROM cache")
+        else:
+            self._conn().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+
+class RedisCache:
+    """Backend Redis (o compatible). Misma política TTL + LRU por namespace que SQLite."""
+
+    def __init__(self, url, prefix="tech_ideas"):
+        import redis  # Dependencia opcional
+
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, namespace, key):
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _lru_key(self, namespace):
+        return f"{self.prefix}:{namespace}:__lru"
+
+    def get(self, namespace, key, default=None):
+        _namespace_policy(namespace)
+        value = self._redis.get(self._key(namespace, key))
+        if value is None:
+            return default
+        self._redis.zadd(self._lru_key(namespace), {key: time.time()})
+        return json.loads(value)
+
+    def set(self, namespace, key, value):
+        ttl, _ = _namespace_policy(namespace)
+        pipe = self._redis.pipeline()
+        pipe.set(self._key(namespace, key), json.dumps(value, ensure_ascii=False), ex=ttl)
+        pipe.zadd(self._lru_key(namespace), {key: time.time()})
+        pipe.execute()
+        self.evict(namespace)
+
+    def delete(self, namespace, key):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key(namespace, key))
+        pipe.zrem(self._lru_key(namespace), key)
+        pipe.execute()
+
+    def evict(self, namespace):
+        ttl, max_entries = _namespace_policy(namespace)
+        lru_key = self._lru_key(namespace)
+        # Las claves vencidas ya las borra Redis; aquí se limpia su rastro en el índice LRU
+        self._redis.zremrangebyscore(lru_key, 0, time.time() - ttl)
+        extra = self._redis.zcard(lru_key) - max_entries
+        if extra > 0:
+            oldest = [k.decode() if isinstance(k, bytes) else k for k, _ in self._redis.zpopmin(lru_key, extra)]
+            self._redis.delete(*[self._key(namespace, k) for k in oldest])
+
+    def clear(self, namespace=None):
+        namespaces = [namespace] if namespace else list(NAMESPACES)
+        for ns in namespaces:
+            keys = list(self._redis.scan_iter(f"{self.prefix}:{ns}:*"))
+            if keys:
+                self._redis.delete(*keys)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(url=None):
+    """Devuelve la caché compartida del proceso según SHARED_CACHE_URL."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            return _cache
+
+        url = url or os.getenv("SHARED_CACHE_URL", DEFAULT_CACHE_URL)
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            try:
+                _cache = RedisCache(url)
+            except ImportError:
+                print("⚠️ SHARED_CACHE_URL apunta a Redis pero el paquete `redis` no está instalado. Usando SQLite.")
+                _cache = SQLiteCache(DEFAULT_CACHE_URL.removeprefix("sqlite:///"))
+        else:
+            _cache = SQLiteCache(url.removeprefix("sqlite:///"))
+        return _cache
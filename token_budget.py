@@ -0,0 +1,251 @@
+import os
+import time
+import threading
+import functools
+import collections
+
+import prompt_variants
+
+# --- PRESUPUESTO DE TOKENS POR MINUTO (TOKEN BUCKET) ---
+#
+# Cada turno del chat se descuenta de tres cubetas: la del usuario (nombre_id),
+# la de su rol y la de su área. Cada cubeta se recarga de forma continua hasta su
+# límite de tokens por minuto. Antes de llamar al proveedor se estima el costo
+# del turno (prompt + respuesta esperada) y:
+#   1. se elige la ventana de historial más larga (desde el historial completo
+#      hasta la mínima) que alcance en las tres cubetas esperando a lo sumo
+#      TPM_MAX_WAIT_SECONDS la recarga;
+#   2. si ni la ventana mínima alcanza en ese plazo, se rechaza el turno
+#      indicando cuándo reintentar.
+#
+# La estimación se reserva al enviar (los turnos concurrentes la ven) y luego se
+# ajusta con el uso real que reporta el stream (stream_options={"include_usage": True}).
+#
+# Los límites son por proceso: con varios procesos detrás de un balanceador,
+# configurar cada uno con su parte del total. Un límite 0 desactiva esa cubeta.
+
+TPM_LIMITS = {
+    "nombre_id": int(os.getenv("TPM_USER", "20000")),
+    "rol_jerarquico": int(os.getenv("TPM_ROLE", "200000")),
+    "area_proceso": int(os.getenv("TPM_AREA", "100000")),
+}
+MAX_WAIT_SECONDS = float(os.getenv("TPM_MAX_WAIT_SECONDS", "15"))
+
+# Ventana mínima de historial: el último intercambio + la pregunta nueva
+MIN_HISTORY_MESSAGES = 3
+# Respuesta esperada mientras no hay uso real del usuario
+DEFAULT_COMPLETION_TOKENS = 500
+# Tokens extra por mensaje (rol y separadores del formato de chat)
+TOKENS_PER_MESSAGE = 4
+
+SCOPE_LABELS = {"nombre_id": "usuario", "rol_jerarquico": "rol", "area_proceso": "área"}
+
+
+# Si tiktoken está instalado pero falla (p. ej. no puede descargar su codificación),
+# no se reintenta en cada mensaje: se pasa a la aproximación por palabras
+_exact_count_failed = False
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Tokens de un texto (los mensajes del historial se repiten en cada turno: se cachean)."""
+    global _exact_count_failed
+    if not _exact_count_failed:
+        try:
+            return prompt_variants.count_tokens(text)
+        except Exception as e:
+            _exact_count_failed = True
+            print(f"⚠️ No se pudieron contar tokens con tiktoken ({e}). Usando la aproximación por palabras.")
+    return prompt_variants.approximate_tokens(text)
+
+
+def conversation_tokens(conversation):
+    return sum(count_tokens(m["content"]) + TOKENS_PER_MESSAGE for m in conversation)
+
+
+class TokenBucket:
+    """Cubeta que se recarga a tokens_per_minute / 60 por segundo hasta su capacidad."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.level = float(tokens_per_minute)
+        self.updated = time.monotonic()
+
+        # Uso acumulado y del último minuto
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.shrunk = 0
+        self.delayed = 0
+        self.rejected = 0
+        self._recent = collections.deque()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, tokens):
+        """Segundos hasta tener `tokens` disponibles (inf si nunca caben en la cubeta)."""
+        if tokens > self.capacity:
+            return float("inf")
+        return max(0.0, (tokens - self.level) / self.rate)
+
+    def record_usage(self, now, prompt_tokens, completion_tokens):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self._recent.append((now, prompt_tokens + completion_tokens))
+
+    def last_minute(self, now):
+        while self._recent and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+        return sum(tokens for _, tokens in self._recent)
+
+
+class BudgetScheduler:
+    """Cubetas por usuario, rol y área, y la decisión de enviar, recortar, esperar o rechazar cada turno."""
+
+    def __init__(self, limits=None):
+        self.limits = limits or TPM_LIMITS
+        self._lock = threading.Lock()
+        self._buckets = {}
+        # Media móvil de tokens de respuesta por usuario (mejora la estimación del siguiente turno)
+        self._completion_estimate = {}
+
+    def _keys(self, metadata):
+        return [(scope, metadata.get(scope, "N/A")) for scope, limit in self.limits.items() if limit > 0]
+
+    def _bucket(self, key):
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.limits[key[0]])
+        return self._buckets[key]
+
+    def plan(self, metadata, system_message, history):
+        """
+        Elige la ventana de historial y la espera del turno y reserva la estimación.
+
+        Retorna un dict con 'status' ("ok", "shrunk", "delayed" o "rejected"),
+        'conversation' a enviar, 'dropped' (mensajes recortados), 'wait_s' y,
+        si se rechaza, 'limited_by' con la cubeta que no alcanza.
+        """
+        keys = self._keys(metadata)
+        completion_estimate = self._completion_estimate.get(metadata.get("nombre_id"), DEFAULT_COMPLETION_TOKENS)
+
+        with self._lock:
+            now = time.monotonic()
+            buckets = [self._bucket(key) for key in keys]
+            for bucket in buckets:
+                bucket.refill(now)
+
+            # De la ventana completa a la mínima: la primera cuya espera no pase de
+            # MAX_WAIT_SECONDS (una espera corta con todo el historial antes que recortar)
+            min_window = min(MIN_HISTORY_MESSAGES, len(history))
+            for window in range(len(history), min_window - 1, -1):
+                conversation = [system_message] + history[len(history) - window:]
+                prompt_estimate = conversation_tokens(conversation)
+                waits = [bucket.wait_for(prompt_estimate + completion_estimate) for bucket in buckets]
+                wait = max(waits, default=0.0)
+                if window == len(history):
+                    # Las cubetas que no alcanzan para el turno completo son las que lo limitan
+                    limiting = [bucket for bucket, bucket_wait in zip(buckets, waits) if bucket_wait > 0]
+                if wait <= MAX_WAIT_SECONDS:
+                    break
+
+            plan = {
+                "keys": keys,
+                "conversation": conversation,
+                "dropped": len(history) - window,
+                "prompt_estimate": prompt_estimate,
+                "estimate": prompt_estimate + completion_estimate,
+                "wait_s": wait,
+            }
+
+            if wait > MAX_WAIT_SECONDS:
+                scope, value = keys[waits.index(wait)]
+                for bucket in limiting:
+                    bucket.rejected += 1
+                plan.update(status="rejected", limited_by=f"{SCOPE_LABELS[scope]} {value}")
+                return plan
+
+            # La reserva puede dejar la cubeta en negativo: los turnos siguientes esperan esa deuda
+            for bucket in buckets:
+                bucket.level -= plan["estimate"]
+            for bucket in limiting:
+                if wait > 0:
+                    bucket.delayed += 1
+                if plan["dropped"]:
+                    bucket.shrunk += 1
+            plan["status"] = "delayed" if wait > 0 else ("shrunk" if plan["dropped"] else "ok")
+            return plan
+
+    def settle(self, plan, usage=None, response_text=""):
+        """
+        Ajusta la reserva con el uso real del stream (o, si el proveedor no lo
+        reporta, con una estimación a partir del texto de la respuesta).
+        """
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            prompt_tokens, completion_tokens = plan["prompt_estimate"], count_tokens(response_text)
+
+        nombre_id = dict(plan["keys"]).get("nombre_id")
+        with self._lock:
+            now = time.monotonic()
+            for key in plan["keys"]:
+                bucket = self._bucket(key)
+                bucket.level -= (prompt_tokens + completion_tokens) - plan["estimate"]
+                bucket.record_usage(now, prompt_tokens, completion_tokens)
+            if nombre_id is not None:
+                previous = self._completion_estimate.get(nombre_id, DEFAULT_COMPLETION_TOKENS)
+                self._completion_estimate[nombre_id] = round(0.7 * previous + 0.3 * completion_tokens)
+        return prompt_tokens, completion_tokens
+
+    def cancel(self, plan):
+        """Devuelve la reserva de un turno que no llegó a completarse (p. ej. error del proveedor)."""
+        with self._lock:
+            for key in plan["keys"]:
+                bucket = self._bucket(key)
+                bucket.level = min(bucket.capacity, bucket.level + plan["estimate"])
+
+    def snapshot(self, metadata=None, scopes=None):
+        """
+        Estado en vivo de las cubetas (solo las de `metadata` si se indica y, con
+        `scopes`, solo esas cubetas, p. ej. sin las de usuario para no exponer nombre_id).
+        """
+        with self._lock:
+            now = time.monotonic()
+            keys = self._keys(metadata) if metadata else sorted(self._buckets)
+            if scopes is not None:
+                keys = [key for key in keys if key[0] in scopes]
+            rows = []
+            for key in keys:
+                bucket = self._bucket(key)
+                bucket.refill(now)
+                rows.append({
+                    "cubeta": SCOPE_LABELS[key[0]],
+                    "clave": key[1],
+                    "limite_tpm": bucket.capacity,
+                    "disponible": round(bucket.level),
+                    "tokens_ultimo_minuto": bucket.last_minute(now),
+                    "turnos": bucket.requests,
+                    "prompt_tokens": bucket.prompt_tokens,
+                    "completion_tokens": bucket.completion_tokens,
+                    "recortados": bucket.shrunk,
+                    "demorados": bucket.delayed,
+                    "rechazados": bucket.rejected,
+                })
+            return rows
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Devuelve el planificador de presupuesto de tokens del proceso."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BudgetScheduler()
+        return _scheduler
@@ -0,0 +1,348 @@
+import os
+import sys
+import gzip
+import json
+import zlib
+import uuid
+import queue
+import atexit
+import argparse
+import datetime
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# --- ARCHIVO LOCAL DE TRANSCRIPCIONES (AUDITORÍA) ---
+#
+# Cada chat y entrevista finalizados se guardan completos en segmentos JSONL
+# comprimidos, solo de agregado:
+#
+#   data/transcripts/seg-20250131T090000-<pid>-<id>.jsonl.gz
+#   data/transcripts/index.jsonl
+#
+# Un hilo en segundo plano agrupa las transcripciones y escribe cada lote como un
+# miembro gzip independiente (un .jsonl.gz con varios miembros sigue siendo un gzip
+# válido). El segmento activo rota por tamaño o por antigüedad.
+#
+# Varios procesos escriben en la misma carpeta: el candado de archivo index.lock
+# serializa cada lote (segmento + índice) y rebuild_index, para que la
+# reconstrucción no pierda ni duplique entradas escritas por otro proceso.
+#
+# index.jsonl guarda, por transcripción, session_id, nombre_id, fecha, segmento,
+# offset y largo del miembro y la línea dentro del miembro: recuperar una sesión
+# descomprime solo su lote, no el archivo completo.
+#
+# Uso por línea de comandos:
+#   python transcript_archive.py get <session_id>
+#   python transcript_archive.py user <nombre_id>
+#   python transcript_archive.py export --desde 2025-01-01 --hasta 2025-01-31 --out enero.jsonl.gz
+#   python transcript_archive.py rebuild-index
+
+DEFAULT_TRANSCRIPTS_DIR = "data/transcripts"
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "index.lock"
+# Transcripciones por miembro gzip: acota lo que se descomprime para leer una sola
+MEMBER_MAX_RECORDS = 100
+SEGMENT_MAX_BYTES = int(os.getenv("TRANSCRIPT_SEGMENT_MB", "64")) * 1024 * 1024
+SEGMENT_MAX_SECONDS = int(os.getenv("TRANSCRIPT_SEGMENT_SECONDS", str(24 * 3600)))
+
+
+def _fecha(record):
+    """Fecha (YYYY-MM-DD) con la que se indexa una transcripción: la de su fin."""
+    when = record.get("timestamp_fin") or datetime.datetime.now()
+    if isinstance(when, str):
+        when = datetime.datetime.fromisoformat(when)
+    return when.date().isoformat()
+
+
+def _iter_members(path):
+    """Recorre los miembros gzip de un segmento: (offset, largo, bytes descomprimidos)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        payload = decompressor.decompress(data[offset:])
+        if not decompressor.eof:
+            # Miembro truncado (caída a mitad de escritura): se ignora el resto del segmento
+            break
+        length = len(data) - offset - len(decompressor.unused_data)
+        yield offset, length, payload
+        offset += length
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Candado exclusivo entre procesos (bloqueante) sobre `path`."""
+    with open(path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class TranscriptArchive:
+    """Escritor en segundo plano y lector del archivo de transcripciones."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.lock_path = os.path.join(root, LOCK_FILE)
+
+        self._queue = queue.Queue()
+        self._write_lock = threading.Lock()
+        self._segment = None
+        self._segment_started = None
+
+        # Índice en memoria; se completa leyendo solo lo nuevo de index.jsonl (lo escriben también otros procesos)
+        self._index_lock = threading.Lock()
+        self._index_read_bytes = 0
+        self._index_inode = None
+        self._by_session = {}
+        self._by_user = {}
+        self._entries = []
+
+        self._thread = threading.Thread(target=self._writer_loop, name="transcript-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    # --- Escritura ---
+
+    def append(self, record):
+        """Encola una transcripción finalizada. Debe traer 'session_id'; 'nombre_id' y 'timestamp_fin' se indexan."""
+        if not record.get("session_id"):
+            raise ValueError("La transcripción necesita un session_id.")
+        self._queue.put(record)
+
+    def flush(self):
+        """Escribe todo lo encolado (bloqueante). Se llama también al salir del proceso."""
+        while True:
+            pending = self._drain([])
+            if not pending:
+                break
+            self._write(pending)
+        # Esperar también el lote que el hilo escritor pudiera tener en curso
+        self._queue.join()
+
+    def _drain(self, pending):
+        while len(pending) < MEMBER_MAX_RECORDS:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _writer_loop(self):
+        while True:
+            # Espera la primera transcripción y agrupa las que lleguen en ese momento en un solo lote
+            pending = self._drain([self._queue.get()])
+            try:
+                self._write(pending)
+            except Exception as e:  # Un lote inválido no debe detener al escritor
+                print(f"⚠️ Error escribiendo transcripciones: {e}")
+
+    def _current_segment(self):
+        """Segmento activo; rota si superó el tamaño o la antigüedad máxima."""
+        now = datetime.datetime.now()
+        if self._segment:
+            path = os.path.join(self.root, self._segment)
+            too_big = os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES
+            too_old = (now - self._segment_started).total_seconds() >= SEGMENT_MAX_SECONDS
+            if not (too_big or too_old):
+                return self._segment
+        self._segment = f"seg-{now.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}.jsonl.gz"
+        self._segment_started = now
+        return self._segment
+
+    def _write(self, records):
+        try:
+            self._write_member(records)
+        finally:
+            for _ in records:
+                self._queue.task_done()
+
+    def _write_member(self, records):
+        lines = [json.dumps(r, ensure_ascii=False, default=str) for r in records]
+        member = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+
+        with self._write_lock, _file_lock(self.lock_path):
+            segment = self._current_segment()
+            with open(os.path.join(self.root, segment), "ab") as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # El índice se escribe después del segmento: si el proceso cae entre ambos, rebuild_index lo recupera
+            entries = [self._index_entry(r, segment, offset, len(member), i) for i, r in enumerate(records)]
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+
+    @staticmethod
+    def _index_entry(record, segment, offset, length, line):
+        return {
+            "session_id": record.get("session_id"),
+            "nombre_id": record.get("nombre_id"),
+            "app": record.get("app"),
+            "fecha": _fecha(record),
+            "segment": segment,
+            "offset": offset,
+            "length": length,
+            "line": line,
+        }
+
+    # --- Índice ---
+
+    def _refresh_index(self):
+        """Agrega al índice en memoria las entradas nuevas de index.jsonl (lectura incremental)."""
+        with self._index_lock:
+            try:
+                stat = os.stat(self.index_path)
+            except OSError:
+                return
+            if stat.st_ino != self._index_inode:
+                # index.jsonl reemplazado por rebuild_index (de este u otro proceso): releer desde el inicio
+                self._index_inode = stat.st_ino
+                self._index_read_bytes = 0
+                self._by_session, self._by_user, self._entries = {}, {}, []
+            if stat.st_size <= self._index_read_bytes:
+                return
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_read_bytes)
+                chunk = f.read()
+            # Solo líneas completas; una escritura a medias de otro proceso se lee en la próxima consulta
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self._index_read_bytes += len(complete)
+            for line in complete.decode("utf-8").splitlines():
+                if line.strip():
+                    self._add_entry(json.loads(line))
+
+    def _add_entry(self, entry):
+        self._entries.append(entry)
+        # La última transcripción de una sesión reemplaza a las anteriores (p. ej. reintento al finalizar)
+        self._by_session[entry["session_id"]] = entry
+        self._by_user.setdefault(entry.get("nombre_id"), []).append(entry)
+
+    def rebuild_index(self):
+        """Reconstruye index.jsonl recorriendo todos los segmentos (recuperación tras una caída)."""
+        self.flush()
+        with self._write_lock, _file_lock(self.lock_path):
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for segment in sorted(f for f in os.listdir(self.root) if f.startswith("seg-")):
+                    for offset, length, payload in _iter_members(os.path.join(self.root, segment)):
+                        for i, line in enumerate(payload.decode("utf-8").splitlines()):
+                            entry = self._index_entry(json.loads(line), segment, offset, length, i)
+                            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.index_path)
+
+        # El inodo nuevo hace que _refresh_index relea el índice completo
+        self._refresh_index()
+
+    # --- Lectura ---
+
+    def _read_member(self, entry):
+        with open(os.path.join(self.root, entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            return gzip.decompress(f.read(entry["length"])).decode("utf-8").splitlines()
+
+    def get(self, session_id):
+        """Transcripción completa de una sesión (la más reciente si se archivó más de una vez), o None."""
+        self._refresh_index()
+        entry = self._by_session.get(session_id)
+        if entry is None:
+            return None
+        return json.loads(self._read_member(entry)[entry["line"]])
+
+    def sessions_for_user(self, nombre_id):
+        """Entradas del índice (sin descomprimir) de las sesiones de un usuario."""
+        self._refresh_index()
+        return list(self._by_user.get(nombre_id, []))
+
+    def iter_range(self, fecha_desde=None, fecha_hasta=None):
+        """
+        Recorre en orden de escritura las transcripciones con fecha en el rango
+        (inclusive). Cada lote se descomprime una sola vez y nada se acumula en memoria.
+        """
+        self._refresh_index()
+        with self._index_lock:
+            entries = [
+                e for e in self._entries
+                if (not fecha_desde or e["fecha"] >= str(fecha_desde)) and (not fecha_hasta or e["fecha"] <= str(fecha_hasta))
+            ]
+
+        member_key, lines = None, []
+        for entry in entries:
+            key = (entry["segment"], entry["offset"])
+            if key != member_key:
+                member_key, lines = key, self._read_member(entry)
+            yield json.loads(lines[entry["line"]])
+
+    def export(self, out_path, fecha_desde=None, fecha_hasta=None):
+        """Exporta un rango de fechas a JSONL (comprimido si out_path termina en .gz). Retorna cuántas se escribieron."""
+        opener = gzip.open if out_path.endswith(".gz") else open
+        count = 0
+        with opener(out_path, "wt", encoding="utf-8") as out:
+            for record in self.iter_range(fecha_desde, fecha_hasta):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive(root=None):
+    """Devuelve el archivo de transcripciones del proceso (TRANSCRIPTS_DIR o data/transcripts)."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = TranscriptArchive(root or os.getenv("TRANSCRIPTS_DIR", DEFAULT_TRANSCRIPTS_DIR))
+        return _archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta y exporta el archivo local de transcripciones.")
+    parser.add_argument("--dir", help="Carpeta del archivo (por defecto TRANSCRIPTS_DIR o data/transcripts)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    get_cmd = commands.add_parser("get", help="Imprime la transcripción de una sesión")
+    get_cmd.add_argument("session_id")
+    user_cmd = commands.add_parser("user", help="Lista las sesiones archivadas de un usuario")
+    user_cmd.add_argument("nombre_id")
+    export_cmd = commands.add_parser("export", help="Exporta un rango de fechas a JSONL")
+    export_cmd.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (inclusive)")
+    export_cmd.add_argument("--hasta", help="Fecha final YYYY-MM-DD (inclusive)")
+    export_cmd.add_argument("--out", required=True, help="Archivo de salida (.jsonl o .jsonl.gz)")
+    commands.add_parser("rebuild-index", help="Reconstruye index.jsonl desde los segmentos")
+    args = parser.parse_args()
+
+    archive = get_archive(args.dir)
+    if args.command == "get":
+        record = archive.get(args.session_id)
+        if record is None:
+            print(f"❌ No hay transcripción archivada para {args.session_id}.")
+            return 1
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+    elif args.command == "user":
+        for entry in archive.sessions_for_user(args.nombre_id):
+            print(f"{entry['fecha']}  {entry['app'] or '-':<8} {entry['session_id']}")
+    elif args.command == "export":
+        count = archive.export(args.out, args.desde, args.hasta)
+        print(f"✅ {count} transcripciones exportadas a {args.out}")
+    elif args.command == "rebuild-index":
+        archive.rebuild_index()
+        print(f"✅ Índice reconstruido: {len(archive._entries)} transcripciones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())